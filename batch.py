@@ -0,0 +1,196 @@
+"""Solve many crosswords in one run, streaming one JSON line per result.
+
+The manifest is a JSONL file (or - for stdin) with one job per line:
+
+    {"id": "monday", "structure": "data/structure1.txt", "words": "data/words1.txt"}
+
+"id" is optional (the line number is used instead), and a job may set
+"engine", "inference", "heuristic", "restarts", "seed", "timeout" and
+"max_nodes" to override the command-line defaults. Jobs run concurrently
+in a process pool, one job per task, and each result is written as soon
+as it is done; each worker keeps the vocabularies it has loaded, so a
+words file is opened at most once per worker.
+
+Results of grids already solved with the same words are read from the
+solution cache (see cache.py) unless --no-cache is given.
+
+With --images, every solution is also rendered (as PNG or SVG) in the
+worker that found it, into a file named after the job id.
+
+Usage: python batch.py manifest.jsonl [--workers N] [--output results.jsonl] [--images DIRECTORY]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cache import SolutionCache
+from crossword import Crossword
+from generate import TimedOut, make_creator, serialize_assignment
+from vocabulary import Vocabulary
+
+# Vocabularies loaded by this process, by words file
+vocabularies = {}
+
+
+def load_vocabulary(words_file):
+    """Return the vocabulary of a words file, loading it only once."""
+    if words_file not in vocabularies:
+        vocabularies[words_file] = Vocabulary.open(words_file)
+    return vocabularies[words_file]
+
+
+def read_manifest(lines):
+    """Return the jobs of a manifest, as dicts with an "id"."""
+    jobs = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        job = json.loads(line)
+        job.setdefault("id", number)
+        jobs.append(job)
+    return jobs
+
+
+def save_image(creator, assignment, directory, name, format):
+    """Render a solution into `directory` and return the path of the file."""
+    path = os.path.join(directory, f"{name}.{format}")
+    data = creator.render(assignment, format)
+    with open(path, "w" if format == "svg" else "wb") as f:
+        f.write(data)
+    return path
+
+
+def solve_job(job, defaults):
+    """Solve one job and return its result dict."""
+    result = {"id": job["id"], "structure": job.get("structure"), "words": job.get("words")}
+    options = dict(defaults)
+    options.update(
+        (key, job[key]) for key in ("engine", "inference", "heuristic", "restarts", "seed", "timeout", "max_nodes")
+        if key in job
+    )
+    if options.get("inference") == "none":
+        options["inference"] = None
+    timeout = options.pop("timeout", None)
+    max_nodes = options.pop("max_nodes", None)
+    options.pop("images", None)
+    options.pop("format", None)
+    use_cache = options.pop("cache", True)
+    start = time.perf_counter()
+    try:
+        crossword = Crossword(
+            job["structure"], job["words"],
+            vocabulary=load_vocabulary(job["words"])
+        )
+        creator = make_creator(crossword, **options)
+
+        def search():
+            return creator.solve(timeout=timeout, node_limit=max_nodes)
+        if use_cache:
+            assignment, cached = SolutionCache().solve(crossword, search)
+            if cached:
+                result["cached"] = True
+        else:
+            assignment = search()
+    except Exception as error:
+        result.update(status="error", error=f"{type(error).__name__}: {error}")
+    else:
+        if isinstance(assignment, TimedOut):
+            result.update(
+                status="timeout", reason=assignment.reason,
+                partial=serialize_assignment(assignment.partial)
+            )
+        elif assignment is None:
+            result.update(status="unsolvable", assignment=None)
+        else:
+            result.update(status="solved", assignment=serialize_assignment(assignment))
+            images = defaults.get("images")
+            if images:
+                try:
+                    result["image"] = save_image(creator, assignment, images, job["id"], defaults["format"])
+                except OSError as error:
+                    result["image_error"] = f"{type(error).__name__}: {error}"
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def run(jobs, defaults, workers, output):
+    """Solve the jobs in a pool of `workers` processes, writing each result
+    to `output` as soon as it is done. Return the results."""
+    results = []
+
+    def write(result):
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        results.append(result)
+
+    if workers <= 1:
+        for job in jobs:
+            write(solve_job(job, defaults))
+        return results
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(solve_job, job, defaults) for job in jobs]
+        for future in as_completed(futures):
+            write(future.result())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve a manifest of crosswords.")
+    parser.add_argument("manifest", help="JSONL file of jobs, or - for stdin")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="number of processes (default: number of CPUs)"
+    )
+    parser.add_argument("--output", help="file to write the results to (default: stdout)")
+    parser.add_argument("--engine", choices=("sets", "numpy"), default="sets")
+    parser.add_argument("--inference", choices=("none", "forward", "mac"), default="mac")
+    parser.add_argument("--heuristic", default="degree")
+    parser.add_argument("--timeout", type=float, help="seconds each search may run")
+    parser.add_argument("--max-nodes", type=int, help="nodes each search may expand")
+    parser.add_argument("--no-cache", action="store_true", help="solve every job instead of reusing cached results")
+    parser.add_argument("--images", metavar="DIRECTORY", help="render every solution into this directory")
+    parser.add_argument("--format", choices=("png", "svg"), default="png", help="format of the rendered solutions")
+    args = parser.parse_args()
+
+    if args.manifest == "-":
+        jobs = read_manifest(sys.stdin)
+    else:
+        with open(args.manifest) as f:
+            jobs = read_manifest(f)
+    defaults = {
+        "engine": args.engine,
+        "inference": None if args.inference == "none" else args.inference,
+        "heuristic": args.heuristic,
+        "timeout": args.timeout,
+        "max_nodes": args.max_nodes,
+        "images": args.images,
+        "format": args.format,
+        "cache": not args.no_cache,
+    }
+    if args.images:
+        os.makedirs(args.images, exist_ok=True)
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        results = run(jobs, defaults, args.workers, output)
+    finally:
+        if args.output:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    solved = sum(result["status"] == "solved" for result in results)
+    print(
+        f"{len(results)} puzzles ({solved} solved) in {elapsed:.3f}s, "
+        f"{len(results) / elapsed if elapsed else 0:.1f} puzzles/s",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""Benchmark the solver on synthetic crosswords.
+
+Grids (size, block density, symmetry) and vocabularies (size, word length
+distribution) are generated from a seed, so every run solves exactly the
+same instances without any download. CORPUS is a fixed set of such
+instances chosen to be hard for the search; --random adds generated ones.
+
+Every solve is split into phases (load, node consistency, arc consistency,
+search) and the wall time and peak memory of each phase are reported, with
+the nodes per second of the search. Results can be saved as JSON and
+compared against a previous run to catch regressions. The search is
+deterministic, randomized restarts included once seeded (--restarts), so
+a number of nodes that differs from the baseline is reported as well:
+comparing against a run saved by another process checks that the same
+seed gives the same search.
+
+Usage: python benchmark.py [--engine sets numpy] [--inference mac] [--save results.json]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from crossword import Crossword
+from generate import SearchInterrupted, make_creator
+from heuristics import HEURISTICS
+from vocabulary import Vocabulary
+
+SYMMETRIES = ("none", "rotational", "mirror")
+
+# Relative frequencies of the letters in English words, used to draw the
+# letters of generated vocabularies so crossings are neither trivial nor
+# hopeless
+LETTER_FREQUENCIES = {
+    "E": 12.0, "T": 9.1, "A": 8.1, "O": 7.7, "I": 7.3, "N": 6.9, "S": 6.3,
+    "R": 6.0, "H": 5.9, "D": 4.3, "L": 4.0, "U": 2.9, "C": 2.7, "M": 2.6,
+    "F": 2.3, "Y": 2.1, "W": 2.1, "G": 2.0, "P": 1.8, "B": 1.5, "V": 1.1,
+    "K": 0.7, "X": 0.2, "Q": 0.1, "J": 0.1, "Z": 0.1,
+}
+
+# Default distribution of word lengths, roughly the one of a dictionary
+LENGTH_WEIGHTS = {
+    2: 1, 3: 4, 4: 8, 5: 10, 6: 10, 7: 9, 8: 7, 9: 5, 10: 4, 11: 3, 12: 2,
+    13: 1, 14: 1, 15: 1,
+}
+
+# Fixed instances, each one a grid and a vocabulary with their generator
+# arguments (seeds included)
+CORPUS = {
+    "open-4x4": {
+        "grid": {"height": 4, "width": 4, "density": 0.0, "symmetry": "none", "seed": 0},
+        "vocabulary": {"size": 3000, "lengths": {4: 1}, "seed": 0},
+    },
+    "open-5x5": {
+        "grid": {"height": 5, "width": 5, "density": 0.0, "symmetry": "none", "seed": 0},
+        "vocabulary": {"size": 8000, "lengths": {5: 1}, "seed": 0},
+    },
+    "open-5x5-scarce": {
+        "grid": {"height": 5, "width": 5, "density": 0.0, "symmetry": "none", "seed": 0},
+        "vocabulary": {"size": 1500, "lengths": {5: 1}, "seed": 0},
+    },
+    "blocked-7x7": {
+        "grid": {"height": 7, "width": 7, "density": 0.15, "symmetry": "rotational", "seed": 5},
+        "vocabulary": {"size": 2000, "lengths": {2: 1, 3: 2, 4: 3, 5: 3, 6: 2, 7: 2}, "seed": 5},
+    },
+    "rotational-9x9": {
+        "grid": {"height": 9, "width": 9, "density": 0.2, "symmetry": "rotational", "seed": 2},
+        "vocabulary": {"size": 8000, "seed": 2},
+    },
+    "mirror-11x11": {
+        "grid": {"height": 11, "width": 11, "density": 0.3, "symmetry": "mirror", "seed": 1},
+        "vocabulary": {"size": 12000, "seed": 1},
+    },
+    "rotational-13x13": {
+        "grid": {"height": 13, "width": 13, "density": 0.3, "symmetry": "rotational", "seed": 1},
+        "vocabulary": {"size": 20000, "seed": 1},
+    },
+    "rotational-15x15": {
+        "grid": {"height": 15, "width": 15, "density": 0.3, "symmetry": "rotational", "seed": 2},
+        "vocabulary": {"size": 30000, "seed": 2},
+    },
+}
+
+PHASES = ("load", "node consistency", "arc consistency", "search")
+
+# Slowdowns smaller than this many seconds are timer noise, not regressions
+NOISE = 0.005
+
+
+def make_grid(height, width, density=0.2, symmetry="rotational", seed=0):
+    """Return the rows of a random grid, "#" for blocks and "_" for cells.
+
+    Each cell is a block with probability `density`. With a "rotational"
+    symmetry the grid looks the same turned by 180 degrees, with "mirror"
+    it looks the same flipped left to right.
+    """
+    if symmetry not in SYMMETRIES:
+        raise ValueError(f"unknown symmetry {symmetry!r}")
+    rng = random.Random(seed)
+    blocks = [[False] * width for _ in range(height)]
+    for i in range(height):
+        for j in range(width):
+            if symmetry == "rotational":
+                twin = (height - 1 - i, width - 1 - j)
+            elif symmetry == "mirror":
+                twin = (i, width - 1 - j)
+            else:
+                twin = (i, j)
+            # Each cell is drawn once, together with its twin
+            if twin < (i, j):
+                continue
+            block = rng.random() < density
+            blocks[i][j] = blocks[twin[0]][twin[1]] = block
+    return ["".join("#" if block else "_" for block in row) for row in blocks]
+
+
+def make_vocabulary(size, lengths=None, seed=0):
+    """Return a sorted list of `size` random words.
+
+    `lengths` maps word lengths to their relative weights (LENGTH_WEIGHTS
+    by default), letters are drawn with English frequencies. Fewer words
+    are returned when a length has run out of distinct words.
+    """
+    rng = random.Random(seed)
+    weights = {int(length): weight for length, weight in (lengths or LENGTH_WEIGHTS).items()}
+    letters = list(LETTER_FREQUENCIES)
+    frequencies = list(LETTER_FREQUENCIES.values())
+    words = set()
+    attempts = 0
+    while len(words) < size and attempts < size * 10:
+        attempts += 1
+        length, = rng.choices(list(weights), list(weights.values()))
+        words.add("".join(rng.choices(letters, frequencies, k=length)))
+    return sorted(words)
+
+
+def make_instance(grid, vocabulary):
+    """Return the (rows, words) of an instance from the arguments of
+    make_grid and make_vocabulary."""
+    return make_grid(**grid), make_vocabulary(**vocabulary)
+
+
+def write_instance(rows, words, directory, name):
+    """Write an instance as a structure file and a words file, and return
+    their paths."""
+    structure_file = os.path.join(directory, f"{name}.structure.txt")
+    words_file = os.path.join(directory, f"{name}.words.txt")
+    with open(structure_file, "w") as f:
+        f.write("\n".join(rows) + "\n")
+    with open(words_file, "w") as f:
+        f.write("\n".join(words) + "\n")
+    return structure_file, words_file
+
+
+def run_phases(structure_file, words_file, options, timeout=None, memory=False):
+    """Solve an instance once, phase by phase.
+
+    Return the status ("solved", "unsolvable" or "timeout"), the number of
+    search nodes and, for each phase, its wall time and (with `memory`) the
+    peak of memory allocated above its start, in bytes.
+    """
+    phases = {}
+    state = {}
+
+    def measure(phase, function):
+        if memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return function()
+        finally:
+            phases[phase] = {"seconds": time.perf_counter() - start}
+            if memory:
+                phases[phase]["peak"] = tracemalloc.get_traced_memory()[1] - base
+
+    def load():
+        vocabulary = Vocabulary.open(words_file, cache=False)
+        state["creator"] = make_creator(
+            Crossword(structure_file, words_file, vocabulary=vocabulary), **options
+        )
+
+    if memory:
+        tracemalloc.start()
+    try:
+        measure("load", load)
+        creator = state["creator"]
+        creator.set_budget(timeout=timeout)
+        measure("node consistency", creator.enforce_node_consistency)
+        try:
+            if not measure("arc consistency", creator.make_consistent):
+                return "unsolvable", 0, phases
+            solved = measure("search", lambda: creator.backtrack(dict()) is not None)
+        except SearchInterrupted:
+            return "timeout", creator.nodes, phases
+        return ("solved" if solved else "unsolvable"), creator.nodes, phases
+    finally:
+        if memory:
+            tracemalloc.stop()
+
+
+def benchmark(name, structure_file, words_file, options, repeat=1, timeout=None, memory=True):
+    """Benchmark one instance with one solver configuration.
+
+    The times are the best of `repeat` runs, the peaks come from one more
+    run under tracemalloc, which would slow down the timed runs.
+    """
+    runs = [run_phases(structure_file, words_file, options, timeout) for _ in range(repeat)]
+    status, nodes, _ = runs[0]
+    phases = {
+        phase: {"seconds": min(run[2][phase]["seconds"] for run in runs if phase in run[2])}
+        for phase in PHASES if phase in runs[0][2]
+    }
+    if memory:
+        _, _, peaks = run_phases(structure_file, words_file, options, timeout, memory=True)
+        for phase, measures in peaks.items():
+            if phase in phases:
+                phases[phase]["peak"] = measures["peak"]
+
+    search = phases.get("search", {}).get("seconds")
+    return {
+        "instance": name,
+        "engine": options["engine"],
+        "inference": options["inference"] or "none",
+        "heuristic": options["heuristic"],
+        "seed": options.get("seed") if options.get("restarts") else None,
+        "status": status,
+        "nodes": nodes,
+        "nodes_per_second": nodes / search if search else None,
+        "seconds": sum(measures["seconds"] for measures in phases.values()),
+        "phases": phases,
+    }
+
+
+def result_key(result):
+    """Return what identifies a result when comparing two runs."""
+    return (
+        result["instance"], result["engine"], result["inference"], result["heuristic"],
+        str(result.get("seed")),
+    )
+
+
+def format_result(result):
+    """Return a result as one line of the report."""
+    cells = [
+        f"{result['instance']:<18}",
+        f"{result['engine']:<6}",
+        f"{result['inference']:<8}",
+        f"{result['heuristic']:<8}",
+        f"{result['status']:<10}",
+    ]
+    for phase in PHASES:
+        measures = result["phases"].get(phase)
+        if measures is None:
+            cells.append(f"{'-':>17}")
+            continue
+        peak = measures.get("peak")
+        memory = f"{peak / 1024:.0f}K" if peak is not None else "-"
+        cells.append(f"{measures['seconds'] * 1000:>9.1f}ms {memory:>6}")
+    rate = result["nodes_per_second"]
+    cells.append(f"{result['nodes']:>9}")
+    cells.append(f"{rate:>10.0f}" if rate is not None else f"{'-':>10}")
+    return " ".join(cells)
+
+
+def report_header():
+    """Return the header line of the report."""
+    cells = [
+        f"{'instance':<18}", f"{'engine':<6}", f"{'infer':<8}",
+        f"{'heuristic':<8}", f"{'status':<10}",
+    ]
+    cells.extend(f"{phase[:17]:>17}" for phase in PHASES)
+    cells.append(f"{'nodes':>9}")
+    cells.append(f"{'nodes/s':>10}")
+    return " ".join(cells)
+
+
+def compare(results, baseline, threshold):
+    """Print the results that got slower than in `baseline` by more than
+    `threshold` (a ratio), and return how many there are."""
+    previous = {result_key(result): result for result in baseline}
+    regressions = 0
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None or not old["seconds"]:
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        slower = ratio > threshold and result["seconds"] - old["seconds"] > NOISE
+        if slower or result["status"] != old["status"]:
+            regressions += 1
+            print(
+                f"REGRESSION {' '.join(result_key(result))}: "
+                f"{old['seconds'] * 1000:.1f}ms -> {result['seconds'] * 1000:.1f}ms "
+                f"(x{ratio:.2f}), {old['status']} -> {result['status']}"
+            )
+        elif result["nodes"] != old["nodes"]:
+            regressions += 1
+            print(
+                f"NODES {' '.join(result_key(result))}: "
+                f"{old['nodes']} -> {result['nodes']}, the search took another path"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the crossword solver.")
+    parser.add_argument(
+        "--instances", nargs="+", choices=sorted(CORPUS), default=sorted(CORPUS),
+        help="corpus instances to run (default: all)"
+    )
+    parser.add_argument(
+        "--random", type=int, default=0, metavar="N",
+        help="also run N generated instances, with the grid and vocabulary options below"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first generated instance")
+    parser.add_argument("--size", type=int, nargs=2, default=(9, 9), metavar=("HEIGHT", "WIDTH"))
+    parser.add_argument("--density", type=float, default=0.2, help="fraction of blocks in the grid")
+    parser.add_argument("--symmetry", choices=SYMMETRIES, default="rotational")
+    parser.add_argument("--words", type=int, default=10000, help="size of the vocabulary")
+    parser.add_argument("--engine", nargs="+", choices=("sets", "numpy"), default=["sets"])
+    parser.add_argument("--inference", nargs="+", choices=("none", "forward", "mac"), default=["mac"])
+    parser.add_argument("--heuristic", nargs="+", choices=sorted(HEURISTICS), default=["degree"])
+    parser.add_argument(
+        "--restarts", type=int, metavar="SEED",
+        help="search with randomized restarts, ties broken with this seed"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per solve, the best one is kept")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds before a search is stopped")
+    parser.add_argument("--no-memory", action="store_true", help="skip the memory measuring run")
+    parser.add_argument("--export", metavar="DIRECTORY", help="write the instances there and exit")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against results saved with --save")
+    parser.add_argument(
+        "--threshold", type=float, default=1.25,
+        help="slowdown ratio reported as a regression (default: 1.25)"
+    )
+    args = parser.parse_args()
+
+    instances = {name: CORPUS[name] for name in args.instances}
+    for k in range(args.random):
+        height, width = args.size
+        seed = args.seed + k
+        instances[f"random-{seed}"] = {
+            "grid": {
+                "height": height, "width": width, "density": args.density,
+                "symmetry": args.symmetry, "seed": seed,
+            },
+            "vocabulary": {"size": args.words, "seed": seed},
+        }
+
+    directory = args.export or tempfile.mkdtemp(prefix="crossword-benchmark-")
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+    for name, parameters in instances.items():
+        files[name] = write_instance(*make_instance(**parameters), directory, name)
+    if args.export:
+        print(f"{len(files)} instances written to {directory}")
+        return
+
+    # Import the engines before timing anything, so the first load does not
+    # pay for it
+    if "numpy" in args.engine:
+        import numpy_engine
+
+    configurations = [
+        {"engine": engine, "inference": None if inference == "none" else inference, "heuristic": heuristic}
+        for engine, inference, heuristic in itertools.product(args.engine, args.inference, args.heuristic)
+    ]
+    if args.restarts is not None:
+        for options in configurations:
+            options.update(restarts=True, seed=args.restarts)
+    results = []
+    print(report_header())
+    try:
+        for name, (structure_file, words_file) in files.items():
+            for options in configurations:
+                result = benchmark(
+                    name, structure_file, words_file, options,
+                    repeat=args.repeat, timeout=args.timeout, memory=not args.no_memory
+                )
+                print(format_result(result), flush=True)
+                results.append(result)
+    finally:
+        for structure_file, words_file in files.values():
+            os.unlink(structure_file)
+            os.unlink(words_file)
+        os.rmdir(directory)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
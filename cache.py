@@ -0,0 +1,150 @@
+"""On-disk cache of solved crosswords.
+
+Results are keyed by a hash of the structure of the crossword and the
+fingerprint of its vocabulary, so solving the same grid with the same
+words again skips the search, whatever files they were read from. Both
+solutions and proofs that there is none are stored; a search stopped by
+its budget proves nothing and is never cached.
+
+Each result is a small JSON file in the "solutions" directory of the
+cache. The cache holds at most `capacity` of them and evicts the least
+recently used one, a file's modification time being its last use.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from vocabulary import cache_directory
+
+# Returned by SolutionCache.get when the crossword is not in the cache
+MISSING = object()
+
+
+def structure_digest(crossword):
+    """Return a hex digest of the squares of a crossword."""
+    rows = (
+        "".join("_" if square else "#" for square in row)
+        for row in crossword.structure
+    )
+    text = f"{crossword.height}x{crossword.width}\n" + "\n".join(rows)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def cache_key(crossword):
+    """Return the key of a crossword: its structure and its words."""
+    return hashlib.sha256(
+        (structure_digest(crossword) + crossword.vocabulary.fingerprint()).encode()
+    ).hexdigest()
+
+
+class SolutionCache():
+
+    def __init__(self, directory=None, capacity=1000):
+        """Open the cache stored in `directory`, by default the "solutions"
+        directory of the cache of the vocabularies."""
+        if directory is None:
+            directory = os.path.join(cache_directory(), "solutions")
+        self.directory = directory
+        self.capacity = capacity
+
+    def path(self, crossword):
+        """Return the path of the entry of a crossword."""
+        return os.path.join(self.directory, f"{cache_key(crossword)}.json")
+
+    def get(self, crossword, default=MISSING):
+        """Return the cached solution of a crossword, as an assignment, or
+        None if it has been proven to have none, or `default` if it is not
+        in the cache."""
+        path = self.path(crossword)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            assignment = entry["assignment"]
+            if assignment is not None:
+                variables = {
+                    (var.i, var.j, var.direction): var for var in crossword.variables
+                }
+                assignment = {
+                    variables[item["i"], item["j"], item["direction"]]: item["word"]
+                    for item in assignment
+                }
+        except FileNotFoundError:
+            return default
+        except (OSError, ValueError, KeyError, TypeError):
+            # Unreadable or written for another grid, forget it
+            self.discard(path)
+            return default
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return assignment
+
+    def solve(self, crossword, search):
+        """Return the (outcome, cached) of a crossword: its cached result if
+        there is one, else the outcome of search(), which is stored if it is
+        a solution or None. A search stopped by its budget is not stored,
+        and neither is anything when the cache can not be written."""
+        assignment = self.get(crossword)
+        if assignment is not MISSING:
+            return assignment, True
+        assignment = search()
+        if assignment is None or isinstance(assignment, dict):
+            try:
+                self.put(crossword, assignment)
+            except OSError:
+                pass
+        return assignment, False
+
+    def put(self, crossword, assignment):
+        """Store the solution of a crossword, None if it has none."""
+        if assignment is not None:
+            assignment = [
+                {"i": var.i, "j": var.j, "direction": var.direction, "word": word}
+                for var, word in sorted(
+                    assignment.items(), key=lambda item: (item[0].i, item[0].j, item[0].direction)
+                )
+            ]
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"assignment": assignment}, f)
+            os.replace(temporary, self.path(crossword))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries beyond the capacity."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((os.stat(path).st_mtime_ns, path))
+            except FileNotFoundError:
+                continue
+        if len(entries) <= self.capacity:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.capacity]:
+            self.discard(path)
+
+    def discard(self, path):
+        """Remove an entry, if it is still there and can be removed."""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove every entry."""
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    self.discard(os.path.join(self.directory, name))
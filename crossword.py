@@ -1,8 +1,13 @@
+from vocabulary import Vocabulary
+
+
 class Variable():
 
     ACROSS = "across"
     DOWN = "down"
 
+    __slots__ = ("i", "j", "direction", "length", "cells", "_hash")
+
     def __init__(self, i, j, direction, length):
         """Create a new variable with starting point, direction, and length."""
         self.i = i
@@ -15,9 +20,14 @@ class Variable():
                 (self.i + (k if self.direction == Variable.DOWN else 0),
                  self.j + (k if self.direction == Variable.ACROSS else 0))
             )
+        self._hash = hash((self.i, self.j, self.direction, self.length))
 
     def __hash__(self):
-        return hash((self.i, self.j, self.direction, self.length))
+        return self._hash
+
+    def __reduce__(self):
+        # The cached hash depends on the process, so rebuild it on unpickling
+        return (Variable, (self.i, self.j, self.direction, self.length))
 
     def __eq__(self, other):
         return (
@@ -35,9 +45,25 @@ class Variable():
         return f"Variable({self.i}, {self.j}, {direction}, {self.length})"
 
 
+class Overlaps(dict):
+    """Overlaps of the crossing pairs of variables of a crossword, a pair
+    of two different variables of it that do not cross is looked up as
+    None."""
+
+    def __init__(self, variables):
+        super().__init__()
+        self.variables = variables
+
+    def __missing__(self, key):
+        v1, v2 = key
+        if v1 != v2 and v1 in self.variables and v2 in self.variables:
+            return None
+        raise KeyError(key)
+
+
 class Crossword():
 
-    def __init__(self, structure_file, words_file):
+    def __init__(self, structure_file, words_file, vocabulary=None):
 
         # Determine structure of crossword
         with open(structure_file) as f:
@@ -57,12 +83,35 @@ class Crossword():
                         row.append(False)
                 self.structure.append(row)
 
-        # Save vocabulary list
-        with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
+        # Save vocabulary list, from its compiled artifact when up to date,
+        # unless an already loaded vocabulary of words_file is given
+        if vocabulary is None:
+            vocabulary = Vocabulary.open(words_file)
+        self.vocabulary = vocabulary
+        self.build()
+
+    @classmethod
+    def from_structure(cls, structure, vocabulary):
+        """Create a crossword from its squares, rows of booleans that are
+        True for the squares to fill, and a loaded vocabulary."""
+        crossword = cls.__new__(cls)
+        crossword.height = len(structure)
+        crossword.width = max((len(row) for row in structure), default=0)
+        crossword.structure = [
+            list(row) + [False] * (crossword.width - len(row)) for row in structure
+        ]
+        crossword.vocabulary = vocabulary
+        crossword.build()
+        return crossword
+
+    def build(self):
+        """Find the variables of the structure and how they cross.
+
+        Only crossing pairs are stored in `overlaps`, but overlaps[v1, v2]
+        is None for any two variables of the crossword that do not cross."""
 
         # Determine variable set
-        self.variables = set()
+        variables = set()
         for i in range(self.height):
             for j in range(self.width):
 
@@ -79,7 +128,7 @@ class Crossword():
                         else:
                             break
                     if length > 1:
-                        self.variables.add(Variable(
+                        variables.add(Variable(
                             i=i, j=j,
                             direction=Variable.DOWN,
                             length=length
@@ -98,36 +147,136 @@ class Crossword():
                         else:
                             break
                     if length > 1:
-                        self.variables.add(Variable(
+                        variables.add(Variable(
                             i=i, j=j,
                             direction=Variable.ACROSS,
                             length=length
                         ))
+        self.connect(variables)
+
+    def connect(self, variables):
+        """Make `variables` the variables of the crossword, and index how
+        they cross."""
+        self.variables = set(variables)
+
+        # Index which variables go through each cell, as (variable, k)
+        # pairs where k is the position of the cell in the variable
+        # The variables are taken in grid order, so the crossings (and every
+        # order derived from them) do not depend on the hash seed
+        self.cell_variables = dict()
+        for var in sorted(self.variables, key=lambda v: (v.i, v.j, v.direction)):
+            for k, cell in enumerate(var.cells):
+                self.cell_variables.setdefault(cell, []).append((var, k))
 
         # Compute overlaps for each word
-        # For any pair of variables v1, v2, their overlap is either:
-        #    None, if the two variables do not overlap; or
-        #    (i, j), where v1's ith character overlaps v2's jth character
-        self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        # Only crossing pairs are stored: for variables v1, v2 sharing a
+        # cell, overlaps[v1, v2] is (i, j), where v1's ith character
+        # overlaps v2's jth character; overlaps[v1, v2] is None for
+        # variables that do not overlap
+        self.overlaps = Overlaps(self.variables)
+        for crossing in self.cell_variables.values():
+            for v1, i in crossing:
+                for v2, j in crossing:
+                    if v1 != v2:
+                        self.overlaps[v1, v2] = (i, j)
 
-    def neighbors(self, var):
-        """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
+        # Cache the neighbors of each variable
+        self._neighbors = {var: [] for var in self.variables}
+        for v1, v2 in self.overlaps:
+            self._neighbors[v1].append(v2)
+        for var, neighbors in self._neighbors.items():
+            self._neighbors[var] = tuple(neighbors)
+
+        # Compact form used by the solver: each variable gets a dense
+        # integer id (its index in self.slots, in grid order), and the
+        # crossings are stored in lists indexed by that id
+        #    lengths[x] is the length of slot x
+        #    neighbor_ids[x] is a tuple of the ids crossing slot x
+        #    slot_overlaps[x][y] is overlaps[slots[x], slots[y]]
+        #    same_length[x] is a tuple of the other ids with the length of x
+        #    length_slots[length] is a tuple of the ids of that length
+        self.slots = sorted(
+            self.variables, key=lambda v: (v.i, v.j, v.direction)
         )
+        self.slot_ids = {var: x for x, var in enumerate(self.slots)}
+        self.lengths = [var.length for var in self.slots]
+        self.neighbor_ids = []
+        self.slot_overlaps = []
+        for var in self.slots:
+            self.neighbor_ids.append(tuple(
+                self.slot_ids[neighbor] for neighbor in self._neighbors[var]
+            ))
+            self.slot_overlaps.append({
+                self.slot_ids[neighbor]: self.overlaps[var, neighbor]
+                for neighbor in self._neighbors[var]
+            })
+        self.length_slots = {}
+        for x, length in enumerate(self.lengths):
+            self.length_slots.setdefault(length, []).append(x)
+        self.length_slots = {
+            length: tuple(slots) for length, slots in self.length_slots.items()
+        }
+        self.same_length = [
+            tuple(y for y in self.length_slots[length] if y != x)
+            for x, length in enumerate(self.lengths)
+        ]
+
+        # Connected components of the crossings, as tuples of slot ids,
+        # largest first: slots of different components share no square,
+        # only the rule that a word is used once
+        self.components = []
+        seen = set()
+        for start in range(len(self.slots)):
+            if start in seen:
+                continue
+            seen.add(start)
+            component = [start]
+            for x in component:
+                for y in self.neighbor_ids[x]:
+                    if y not in seen:
+                        seen.add(y)
+                        component.append(y)
+            self.components.append(tuple(sorted(component)))
+        self.components.sort(key=len, reverse=True)
+
+    def edit(self, block=(), unblock=()):
+        """Return the crossword with the squares in `block` turned into
+        blocks and the ones in `unblock` into squares to fill, given as
+        (i, j) pairs, the grid grows to fit them. The vocabulary is shared,
+        and the variables the edit did not touch are equal to the old ones."""
+        height = max([self.height] + [i + 1 for i, _ in unblock])
+        width = max([self.width] + [j + 1 for _, j in unblock])
+        structure = [
+            [i < self.height and j < self.width and self.structure[i][j] for j in range(width)]
+            for i in range(height)
+        ]
+        for i, j in block:
+            if 0 <= i < height and 0 <= j < width:
+                structure[i][j] = False
+        for i, j in unblock:
+            structure[i][j] = True
+        return Crossword.from_structure(structure, self.vocabulary)
+
+    def region(self, slot_ids):
+        """Return the crossword whose variables are some of the slots of
+        this one, crossing only each other: where they cross the other
+        slots, the squares are still there but belong to no variable."""
+        crossword = Crossword.__new__(Crossword)
+        crossword.height = self.height
+        crossword.width = self.width
+        squares = {cell for x in slot_ids for cell in self.slots[x].cells}
+        crossword.structure = [
+            [(i, j) in squares for j in range(self.width)] for i in range(self.height)
+        ]
+        crossword.vocabulary = self.vocabulary
+        crossword.connect(self.slots[x] for x in slot_ids)
+        return crossword
+
+    @property
+    def words(self):
+        """Set of every word of the vocabulary."""
+        return self.vocabulary.word_set()
+
+    def neighbors(self, var):
+        """Given a variable, return a tuple of overlapping variables."""
+        return self._neighbors[var]
@@ -1,34 +1,190 @@
+import argparse
+import multiprocessing
+import random
 import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from zlib import crc32
 
+import render
+from cache import SolutionCache
 from crossword import *
+from heuristics import HEURISTICS, IndexedHeap, luby
+from nogoods import NogoodStore
+from stats import SearchStats
+
+
+class SearchInterrupted(Exception):
+    
+    #Raised inside the search to stop it early, for example when another worker already found a solution, its reason is
+    #"deadline", "node limit" or "cancelled"
+    
+    def __init__(self, reason="cancelled"):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class TimedOut():
+    
+    #Outcome of a solve that ran out of budget before finding a solution or proving there is none, it is falsy like None but
+    #tells why the search stopped, and holds the deepest partial assignment the search reached (a dict like a solution,
+    #without the unassigned variables) and the number of nodes it expanded
+    
+    def __init__(self, reason, partial, nodes=0):
+        self.reason = reason
+        self.partial = partial
+        self.nodes = nodes
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return f"TimedOut({self.reason!r}, {len(self.partial)} variables assigned, {self.nodes} nodes)"
 
 
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    #Inference run after every assignment in 'backtrack': None keeps the plain search, "forward" revises the neighbors of the
+    #assigned variable (forward checking) and "mac" propagates from them with ac3 (maintaining arc consistency)
+    INFERENCES = (None, "forward", "mac")
+
+    def __init__(
+        self, crossword, inference=None, heuristic="degree", backjumping=True, decompose=True,
+        restarts=False, seed=None, keep_weights=True
+    ):
         
         #initiating the creater class by the helper class 'crossword', and then defining the dmoains
+        if inference not in self.INFERENCES:
+            raise ValueError(f"unknown inference {inference!r}")
+        if heuristic not in HEURISTICS:
+            raise ValueError(f"unknown heuristic {heuristic!r}")
         self.crossword = crossword
-        self.domains = {
-            var: self.crossword.words.copy()
-            for var in self.crossword.variables
+        self.inference = inference
+        self.heuristic = heuristic
+        self.heuristic_key = HEURISTICS[heuristic]
+        self.backjumping = backjumping
+        
+        #with decompose, 'solve' searches the components of the crossword (slots sharing no square) one by one
+        self.decompose = decompose
+        
+        #Randomized restarts: with a seed, the ties of the variable and value orderings are broken at random (tiebreak[x] ranks
+        #slot x among the slots with the same key, salt orders the words with the same count) instead of by slot id and
+        #alphabetically, and with restarts the search starts over with new ties every time it failed more than its cap, the
+        #caps follow the Luby sequence ('search_restarts'), keep_weights carries the dom/wdeg weights from a run to the next
+        self.restarts = restarts
+        self.seed = 0 if restarts and seed is None else seed
+        self.keep_weights = keep_weights
+        self.random = None if self.seed is None else random.Random(self.seed)
+        self.tiebreak = None
+        self.salt = None
+        self.failures = 0
+        self.next_restart = float("inf")
+        
+        #the solver works on the slot ids of the crossword, slot_domains[x] is the domain of crossword.slots[x]
+        self.slot_domains = self.make_domains()
+
+        #AC-4 style support index: letter_counts[x][k][letter] is the number of words still in the domain of slot x that have
+        #that letter at position k, it is built lazily by 'count_letters' and kept up to date by 'remove_words'
+        self.letter_counts = None
+        
+        #Residual supports: letter_losses[x][k] counts how many times a letter disappeared from position k of slot x, and
+        #residues[x, y] remembers that counter for y (plus the number of undos) the last time the arc (x, y) was revised, if
+        #neither changed since, every word of x still has its support in y and the revision can be skipped
+        self.letter_losses = None
+        self.residues = {}
+        self.restorations = 0
+
+        #Trail of (slot, words, counters) removals made during search, so they can be undone on backtrack instead of copying
+        #domains, counters being the letter counters the removal replaced (or None), it stays None until the search needs it
+        self.trail = None
+        
+        #Search state, slot_values[x] is the word assigned to slot x (or None) and used_words the set of assigned words
+        self.slot_values = [None] * len(self.crossword.slots)
+        self.used_words = set()
+        
+        #Variable selection: the unassigned slots wait in a heap ordered by the heuristic, slots whose domain changed are
+        #marked dirty and their key is refreshed before the next pick, weights[x][y] counts the wipe-outs of the crossing
+        #between x and y for dom/wdeg
+        self.heap = None
+        self.dirty = set()
+        self.weights = [dict.fromkeys(neighbors, 1) for neighbors in self.crossword.neighbor_ids]
+        
+        #Number of nodes the search expanded, and its budget: an optional event (anything with is_set()) that stops the search,
+        #only polled once POLL_SECONDS went by since the last time (next_poll) because it may live in another process, a
+        #deadline (a time.monotonic() value) and a limit on the number of nodes, the search checks them when it reaches node
+        #number next_check, and the propagation checks the clock as it goes ('check_clock')
+        self.nodes = 0
+        self.cancel = None
+        self.deadline = None
+        self.node_limit = None
+        self.next_check = float("inf")
+        self.next_poll = 0.0
+        
+        #Deepest partial assignment the search reached (a list like slot_values) and its number of assigned slots, returned
+        #with a TimedOut outcome
+        self.deepest = None
+        self.deepest_depth = -1
+        
+        #Conflict-directed backjumping: when a slot runs out of values the search returns its conflict set, the assigned slots
+        #responsible for the failure, and every slot on the way up that is not in it is skipped, pruned_by[x] holds the slots
+        #whose forward checking removed words from x, and the conflict sets are also learned as nogoods, so the same
+        #combination of words is rejected right away in the other branches
+        self.pruned_by = None
+        self.wiped = None
+        self.nogoods = NogoodStore() if backjumping else None
+        self.solutions_found = 0
+        
+        #Optional SearchStats, when it is set the search counts what it does and times its phases, else nothing is collected
+        self.stats = None
+
+    #How long the search may go without polling its cancel event, in seconds
+    POLL_SECONDS = 0.02
+    
+    #How many failures the first run of a search with restarts may have, run k may have RESTART_SCALE * luby(k)
+    RESTART_SCALE = 300
+
+    def options(self):
+        
+        #Function that return the keyword arguments this creator was built with, to build the same creator somewhere else
+        
+        return {
+            "inference": self.inference, "heuristic": self.heuristic, "backjumping": self.backjumping,
+            "decompose": self.decompose, "restarts": self.restarts, "seed": self.seed, "keep_weights": self.keep_weights
         }
 
+    def make_domains(self):
+        
+        #Function that return the initial domain of each slot: the bucket of the vocabulary with the words of its length,
+        #the buckets are frozensets shared by every slot of that length, and a slot only gets its own copy ('own_domain') the
+        #first time a word is removed from it
+        
+        vocabulary = self.crossword.vocabulary
+        self.owned = [False] * len(self.crossword.slots)
+        return [vocabulary.bucket(length) for length in self.crossword.lengths]
+
+    def own_domain(self, x):
+        
+        #The purpose of this function is to give slot x its own copy of its shared domain (and of its letter counters), just
+        #before the first removal
+        
+        self.slot_domains[x] = set(self.slot_domains[x])
+        if self.letter_counts is not None:
+            self.letter_counts[x] = [Counter(counts) for counts in self.letter_counts[x]]
+        self.owned[x] = True
+
+    @property
+    def domains(self):
+        
+        #Function that return the domain of each variable, as a dict over the same objects the solver works on
+        
+        return dict(zip(self.crossword.slots, self.slot_domains))
+
     def letter_grid(self, assignment):
         
         #Function that return 2D array representing a given assignment.
         
-        letters = [
-            [None for _ in range(self.crossword.width)]
-            for _ in range(self.crossword.height)
-        ]
-        for variable, word in assignment.items():
-            direction = variable.direction
-            for k in range(len(word)):
-                i = variable.i + (k if direction == Variable.DOWN else 0)
-                j = variable.j + (k if direction == Variable.ACROSS else 0)
-                letters[i][j] = word[k]
-        return letters
+        return render.letter_grid(self.crossword, assignment)
 
     def print(self, assignment):
         
@@ -45,52 +201,491 @@ class CrosswordCreator():
 
     def create_image(self, assignment, filename):
         
-        #The purpose of this function is to create image from the puzzle we solved
+        #The purpose of this function is to create image from the puzzle we solved, a filename ending with .svg gets a vector
+        #image, any other one a PNG
         
-        from PIL import Image, ImageDraw, ImageFont
-        cell_size = 100
-        cell_border = 2
-        interior_size = cell_size - 2 * cell_border
-        letters = self.letter_grid(assignment)
+        format = "svg" if filename.lower().endswith(".svg") else "png"
+        data = self.render(assignment, format)
+        with open(filename, "w" if format == "svg" else "wb") as f:
+            f.write(data)
 
-        # Create a blank canvas
-        img = Image.new(
-            "RGBA",
-            (self.crossword.width * cell_size,
-             self.crossword.height * cell_size),
-            "black"
-        )
-        font = ImageFont.truetype("assets/fonts/OpenSans-Regular.ttf", 80)
-        draw = ImageDraw.Draw(img)
+    def render(self, assignment, format="png", **options):
+        
+        #Function that return the image of the puzzle in memory: PNG bytes, an SVG string, or a PIL image for "image", the
+        #font and the letter tiles are cached by the 'render' module between calls
+        
+        return render.render(self.crossword, assignment, format, **options)
 
-        for i in range(self.crossword.height):
-            for j in range(self.crossword.width):
 
-                rect = [
-                    (j * cell_size + cell_border,
-                     i * cell_size + cell_border),
-                    ((j + 1) * cell_size - cell_border,
-                     (i + 1) * cell_size - cell_border)
-                ]
-                if self.crossword.structure[i][j]:
-                    draw.rectangle(rect, fill="white")
-                    if letters[i][j]:
-                        w, h = draw.textsize(letters[i][j], font=font)
-                        draw.text(
-                            (rect[0][0] + ((interior_size - w) / 2),
-                             rect[0][1] + ((interior_size - h) / 2) - 10),
-                            letters[i][j], fill="black", font=font
-                        )
+    def solve(self, workers=1, timeout=None, deadline=None, node_limit=None, cancel=None):
+        #solving the probelm by enforcing node consistency then using ac3 algorithm, then using the bactrack technique,
+        #with more than one worker the search is split between processes by 'solve_parallel', a crossword made of several
+        #components is solved one component at a time by 'solve_components'
+        
+        #the search can be given a budget: a timeout in seconds or a deadline (a time.monotonic() value), a maximum number of
+        #nodes, and a cancel event, when it runs out the outcome is a TimedOut instead of a solution or None
+        self.set_budget(timeout, deadline, node_limit, cancel)
+        if self.decompose and len(self.crossword.components) > 1:
+            return self.solve_components(workers)
+        if workers > 1:
+            return self.solve_parallel(workers)
+        try:
+            if not self.prepare():
+                return None
+            return self.run_phase("search", self.backtrack, dict())
+        except SearchInterrupted as interruption:
+            return TimedOut(interruption.reason, self.partial_assignment(), self.nodes)
+
+    def set_budget(self, timeout=None, deadline=None, node_limit=None, cancel=None):
+        
+        #The purpose of this function is to set the budget of the next searches, see 'solve', the search then raises
+        #SearchInterrupted when the budget runs out
+        
+        if timeout is not None:
+            end = time.monotonic() + timeout
+            deadline = end if deadline is None else min(deadline, end)
+        self.deadline = deadline
+        self.node_limit = node_limit
+        if cancel is not None:
+            self.cancel = cancel
+        self.next_poll = 0.0
+        self.schedule_check()
+
+    def schedule_check(self):
+        
+        #The purpose of this function is to choose the node at which the search checks its budget next, reading the clock is
+        #cheap so a deadline or a cancel event is checked at every node, 'check_clock' decides when the event is polled
+        
+        next_check = float("inf")
+        if self.cancel is not None or self.deadline is not None:
+            next_check = self.nodes + 1
+        if self.node_limit is not None:
+            next_check = min(next_check, self.node_limit + 1)
+        self.next_check = next_check
+
+    def check_budget(self):
+        
+        #The purpose of this function is to raise SearchInterrupted if the budget of the search ran out
+        
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchInterrupted("node limit")
+        self.check_clock()
+        self.schedule_check()
+
+    def check_clock(self):
+        
+        #The purpose of this function is to raise SearchInterrupted if the deadline passed, or if the cancel event is set,
+        #the event is only polled when POLL_SECONDS went by since the last time, whatever the number of nodes in between
+        
+        if self.deadline is None and self.cancel is None:
+            return
+        now = time.monotonic()
+        if self.deadline is not None and now >= self.deadline:
+            raise SearchInterrupted("deadline")
+        if self.cancel is not None and now >= self.next_poll:
+            self.next_poll = now + self.POLL_SECONDS
+            if self.cancel.is_set():
+                raise SearchInterrupted("cancelled")
+
+    def partial_assignment(self):
+        
+        #Function that return the deepest partial assignment the search reached, as a dict of the assigned variables
+        
+        if self.deepest is None:
+            return dict()
+        return {
+            var: value for var, value in zip(self.crossword.slots, self.deepest)
+            if value is not None
+        }
 
-        img.save(filename)
+    def prepare(self):
+        
+        #The purpose of this function is to run the steps every search starts with, node consistency then arc consistency,
+        #it returns False if the crossword has no solution
+        
+        self.run_phase("node consistency", self.enforce_node_consistency)
+        return self.run_phase("arc consistency", self.make_consistent)
+
+    def make_consistent(self):
+        
+        #The purpose of this function is to run ac3 on every arc, then to propagate the all-different constraint of the slots
+        #of each length ('all_different_slots'), and to go back to ac3 from the slots it pruned until nothing changes, it
+        #returns False if a domain was wiped out or a length has fewer words left than slots
+        
+        if not self.ac3():
+            return False
+        neighbor_ids = self.crossword.neighbor_ids
+        while True:
+            pruned = self.all_different_slots(range(len(self.crossword.slots)))
+            if pruned is None:
+                return False
+            if not pruned:
+                return True
+            if not self.ac3_slots([(z, y) for y in pruned for z in neighbor_ids[y]]):
+                return False
 
+    def run_phase(self, phase, function, *args):
+        
+        #Function that return function(*args), timing it as `phase` when statistics are collected
+        
+        if self.stats is None:
+            return function(*args)
+        return self.stats.timed(phase, function, *args)
 
-    def solve(self):
-        #solving the probelm by enforcing node consistency then using ac3 algorithm, then using the bactrack technique
+    def solve_parallel(self, workers):
         
-        self.enforce_node_consistency()
-        self.ac3()
-        return self.backtrack(dict())
+        #The purpose of this function is to split the search between `workers` processes: the domain of the first variable
+        #the search would pick is dealt round-robin (in least-constraining order) into chunks, each chunk is searched by a
+        #worker with that variable restricted to it, and the first solution found cancels the other workers
+        
+        #the workers check the deadline themselves, and the node limit is split between the chunks, the nodes they expanded
+        #are added to this creator's, the cancel event given to 'solve' is polled here and passed on to the workers
+        
+        try:
+            if not self.prepare():
+                return None
+        except SearchInterrupted as interruption:
+            return TimedOut(interruption.reason, dict(), self.nodes)
+        var = self.select_unassigned_variable(dict())
+        if var is None:
+            return self.backtrack(dict())
+        values = self.order_domain_values(var, dict())
+        
+        #a few chunks per worker, so a worker that finishes its chunk early picks up another one
+        count = min(len(values), workers * 4)
+        chunks = [values[k::count] for k in range(count)]
+        x = self.crossword.slot_ids[var]
+        budget = self.split_budget(count)
+        
+        cancel = multiprocessing.Event()
+        executor = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(cancel,))
+        timed_out = None
+        try:
+            pending = set(
+                executor.submit(solve_chunk, type(self), self.crossword, self.options(), x, chunk, budget)
+                for chunk in chunks
+            )
+            while pending:
+                done, pending = wait(
+                    pending, timeout=None if self.cancel is None else 0.1, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    slot_values, nodes = future.result()
+                    self.add_nodes(nodes)
+                    
+                    #a chunk that ran out of budget leaves the others a chance, we keep its partial assignment if it
+                    #went deeper than the others
+                    if isinstance(slot_values, TimedOut):
+                        if timed_out is None or len(slot_values.partial) > len(timed_out.partial):
+                            timed_out = slot_values
+                    elif slot_values is not None:
+                        cancel.set()
+                        return dict(zip(self.crossword.slots, slot_values))
+                if self.cancel is not None and self.cancel.is_set():
+                    partial = timed_out.partial if timed_out is not None else dict()
+                    return TimedOut("cancelled", partial, self.nodes)
+            if timed_out is not None:
+                return TimedOut(timed_out.reason, timed_out.partial, self.nodes)
+            return None
+        finally:
+            
+            #the answer is returned without waiting for the workers, they see the cancel event and stop on their own
+            cancel.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def solve_components(self, workers=1):
+        
+        #The purpose of this function is to solve a crossword whose slots fall into components that share no square: each
+        #component is searched on its own (in `workers` processes when there are more than one), so a failure in one of them
+        #never makes the search go through the others again, and it costs the sum of the components instead of their product
+        
+        #the components still have to use different words, if their solutions share one, they are searched again one after
+        #the other, each one without the words of the ones before ('component_solutions')
+        subgrids = [self.crossword.region(component) for component in self.crossword.components]
+        if workers > 1:
+            outcomes = self.solve_components_parallel(subgrids, workers)
+        else:
+            outcomes = []
+            for subgrid in subgrids:
+                creator = self.derived_creator(subgrid)
+                outcomes.append(creator.solve(deadline=self.deadline, node_limit=self.node_limit, cancel=self.cancel))
+                self.nodes = creator.nodes
+                if not outcomes[-1]:
+                    break
+        
+        #a component without a solution is enough to prove there is none, a component that ran out of budget stops it all
+        if any(outcome is None for outcome in outcomes):
+            return None
+        assignment = dict()
+        for outcome in outcomes:
+            if isinstance(outcome, TimedOut):
+                for partial in outcomes:
+                    assignment.update(partial.partial if isinstance(partial, TimedOut) else partial)
+                return TimedOut(outcome.reason, assignment, self.nodes)
+            assignment.update(outcome)
+        if len(set(assignment.values())) == len(assignment):
+            return assignment
+        
+        try:
+            for assignment in self.component_solutions(subgrids):
+                return assignment
+            return None
+        except SearchInterrupted as interruption:
+            return TimedOut(interruption.reason, self.partial_assignment(), self.nodes)
+
+    def derived_creator(self, crossword):
+        
+        #Function that return a creator of a crossword derived from this one's (one of its components, or the same grid for a
+        #new search), with the options and the budget of this one, its nodes are counted on from this one's, so the node limit
+        #applies to all its searches together
+        
+        creator = type(self)(crossword, **self.options())
+        creator.POLL_SECONDS = self.POLL_SECONDS
+        creator.stats = self.stats
+        creator.nodes = self.nodes
+        creator.set_budget(deadline=self.deadline, node_limit=self.node_limit, cancel=self.cancel)
+        return creator
+
+    def component_solutions(self, subgrids, excluded=frozenset(), prefix=None):
+        
+        #The purpose of this function is to yield the assignments of the components in `subgrids` that use different words
+        #from each other and from `excluded`: the first component is searched without those words, and for each of its
+        #solutions the next components without its words too, when the budget runs out the deepest partial assignment is
+        #the one 'partial_assignment' returns
+        
+        prefix = dict() if prefix is None else prefix
+        if not subgrids:
+            yield prefix
+            return
+        creator = self.derived_creator(subgrids[0])
+        creator.enforce_node_consistency()
+        for x, length in enumerate(creator.crossword.lengths):
+            for word in excluded:
+                if len(word) == length:
+                    creator.discard_word(x, word)
+        if not creator.make_consistent():
+            return
+        creator.start_search(dict())
+        
+        #the search of this component waits while the next ones run, so its node count catches up before it resumes
+        solutions = creator.timed_solutions()
+        while True:
+            creator.nodes = self.nodes
+            try:
+                next(solutions)
+            except StopIteration:
+                return
+            except SearchInterrupted:
+                partial = dict(prefix)
+                partial.update(creator.partial_assignment())
+                self.deepest = [partial.get(var) for var in self.crossword.slots]
+                raise
+            finally:
+                self.nodes = creator.nodes
+            assignment = dict(prefix)
+            assignment.update(zip(creator.crossword.slots, creator.slot_values))
+            yield from self.component_solutions(
+                subgrids[1:], excluded | set(creator.slot_values), assignment
+            )
+
+    def resolve(self, previous, pins=None, timeout=None, deadline=None, node_limit=None, cancel=None):
+        
+        #The purpose of this function is to solve the crossword again after a small edit (see 'Crossword.edit'), starting from
+        #`previous`, a solution of the grid before the edit, and `pins`, a dict of words the user fixed on some variables: the
+        #variables that are still there keep their previous word when it still fits, only the slots around the change are
+        #searched, and that region grows ring by ring (by distance in the crossings) until it has a solution, so the work
+        #follows the size of the change rather than the size of the grid
+        
+        #the outcome is the same as for 'solve': a solution, None if there is none with these pins, or a TimedOut
+        self.set_budget(timeout, deadline, node_limit, cancel)
+        crossword = self.crossword
+        slot_ids = crossword.slot_ids
+        slot_overlaps = crossword.slot_overlaps
+        pins = dict(pins or {})
+        for var, word in pins.items():
+            if var not in slot_ids:
+                raise ValueError(f"{var} is not a variable of the crossword")
+            if word not in crossword.vocabulary.bucket(var.length):
+                raise ValueError(f"{word!r} is not a word of length {var.length} in the vocabulary")
+        
+        #the pins go first, then every previous word that does not clash with what is already kept, the slots left without a
+        #word are where the grid changed
+        fixed = [None] * len(crossword.slots)
+        for var, word in pins.items():
+            fixed[slot_ids[var]] = word
+        pinned = {slot_ids[var] for var in pins}
+        used = set(pins.values())
+        if len(used) < len(pins):
+            return None
+        for x in pinned:
+            if any(fixed[y] is not None and fixed[x][i] != fixed[y][j] for y, (i, j) in slot_overlaps[x].items()):
+                return None
+        changed = set()
+        for x, var in enumerate(crossword.slots):
+            if x in pinned:
+                continue
+            word = previous.get(var)
+            if (
+                word is None or word in used or word not in crossword.vocabulary.bucket(var.length) or
+                any(fixed[y] is not None and word[i] != fixed[y][j] for y, (i, j) in slot_overlaps[x].items())
+            ):
+                changed.add(x)
+                continue
+            fixed[x] = word
+            used.add(word)
+        
+        #the rings: distance[x] is the number of crossings between slot x and the closest changed or pinned slot
+        distance = dict.fromkeys(changed | pinned, 0)
+        queue = deque(distance)
+        while queue:
+            x = queue.popleft()
+            for y in crossword.neighbor_ids[x]:
+                if y not in distance:
+                    distance[y] = distance[x] + 1
+                    queue.append(y)
+        
+        #the last region is every slot but the pinned ones, so a grid that needs more than the rings still gets its answer, the
+        #words that fit the letters around a free slot are kept from a ring to the next
+        everything = set(range(len(crossword.slots))) - pinned
+        domains = {}
+        radius = 0
+        while True:
+            free = {x for x, d in distance.items() if d <= radius} - pinned
+            if radius > max(distance.values(), default=0):
+                free = everything
+            outcome = self.solve_region(fixed, free, domains)
+            if outcome is not None or free == everything:
+                return outcome
+            radius = radius * 2 or 1
+
+    def solve_region(self, fixed, free, domains=None):
+        
+        #Function that return a solution where the slots not in `free` keep their word from `fixed` (a list indexed by slot
+        #id), None if there is none, or a TimedOut if the budget ran out, only the free slots are searched: they make a
+        #crossword of their own ('Crossword.region') where each kept slot they cross is a letter their words must have, so the
+        #work follows the number of free slots, `domains` keeps the words that fit those letters from a call to the next
+        
+        crossword = self.crossword
+        vocabulary = crossword.vocabulary
+        assignment = {
+            var: word for x, (var, word) in enumerate(zip(crossword.slots, fixed)) if x not in free
+        }
+        if not free:
+            return assignment
+        used = set(assignment.values())
+        domains = dict() if domains is None else domains
+        
+        #the free slots start with the words that fit the letters of the kept slots they cross, and no kept word
+        region = crossword.region(sorted(free))
+        words = []
+        for var in region.slots:
+            x = crossword.slot_ids[var]
+            letters = tuple(sorted(
+                (i, fixed[y][j]) for y, (i, j) in crossword.slot_overlaps[x].items() if y not in free
+            ))
+            if (x, letters) not in domains:
+                domains[x, letters] = vocabulary.matching(var.length, letters)
+            fitting = domains[x, letters]
+            taken = used.intersection(fitting)
+            if len(fitting) == len(taken):
+                return None
+            words.append((fitting, taken))
+        
+        #the constraints of the kept slots are in the domains, so the region is searched as a whole, splitting it into
+        #components would start them from the whole buckets again
+        creator = self.derived_creator(region)
+        creator.decompose = False
+        for x, (fitting, taken) in enumerate(words):
+            if fitting is not vocabulary.bucket(region.lengths[x]):
+                creator.restrict_domain(x, fitting - taken)
+            else:
+                for word in taken:
+                    creator.discard_word(x, word)
+        try:
+            outcome = creator.solve(deadline=self.deadline, node_limit=self.node_limit, cancel=self.cancel)
+        finally:
+            self.nodes = creator.nodes
+        if isinstance(outcome, TimedOut):
+            assignment.update(outcome.partial)
+            return TimedOut(outcome.reason, assignment, self.nodes)
+        if outcome is None:
+            return None
+        assignment.update(outcome)
+        return assignment
+
+    def solve_components_parallel(self, subgrids, workers):
+        
+        #Function that return the outcome of the search of each component (an assignment, None or a TimedOut), searching them
+        #in `workers` processes, it stops at the first component without a solution, the node limit is split between them
+        
+        cancel = multiprocessing.Event()
+        executor = ProcessPoolExecutor(
+            min(workers, len(subgrids)), initializer=init_worker, initargs=(cancel,)
+        )
+        budget = self.split_budget(len(subgrids))
+        outcomes = [dict() for _ in subgrids]
+        try:
+            futures = {
+                executor.submit(solve_chunk, type(self), subgrid, self.options(), None, None, budget): k
+                for k, subgrid in enumerate(subgrids)
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(
+                    pending, timeout=None if self.cancel is None else 0.1, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    k = futures[future]
+                    slot_values, nodes = future.result()
+                    self.add_nodes(nodes)
+                    if slot_values is None:
+                        return [None]
+                    if isinstance(slot_values, TimedOut):
+                        outcomes[k] = slot_values
+                    else:
+                        outcomes[k] = dict(zip(subgrids[k].slots, slot_values))
+                if self.cancel is not None and self.cancel.is_set():
+                    return outcomes + [TimedOut("cancelled", dict())]
+            return outcomes
+        finally:
+            cancel.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def add_nodes(self, nodes):
+        
+        #Function that add the nodes a worker process expanded to the count of this creator (and to its statistics)
+        
+        self.nodes += nodes
+        if self.stats is not None:
+            self.stats.nodes = self.nodes
+
+    def split_budget(self, count):
+        
+        #Function that return the (deadline, node limit) budget of each of `count` searches run in worker processes, the
+        #nodes left to this creator are shared out evenly so that all of them together stay within its node limit
+        
+        if self.node_limit is None:
+            return (self.deadline, None)
+        return (self.deadline, max(0, self.node_limit - self.nodes) // count)
+
+    def restrict_domain(self, x, words):
+        
+        #The purpose of this function is to remove from the domain of slot x every word that is not in `words`
+        
+        words = set(words)
+        
+        #before the search, with no trail to record the removals and no support index to update, the domain is replaced at once
+        if self.trail is None and self.letter_counts is None:
+            domain = words.intersection(self.slot_domains[x])
+            if self.stats is not None:
+                self.stats.pruned += len(self.slot_domains[x]) - len(domain)
+            self.slot_domains[x] = domain
+            self.owned[x] = True
+            self.dirty.add(x)
+            return
+        removed = [word for word in self.slot_domains[x] if word not in words]
+        if removed:
+            self.remove_words(x, removed)
 
     def enforce_node_consistency(self):
         
@@ -98,51 +693,287 @@ class CrosswordCreator():
         #and comparing each word in the values with the length and keeping only the words that satisfy this constrain
         
         #iterate over the variables
-        for var in self.crossword.variables:
-            unary_constrain = var.length
+        for x, unary_constrain in enumerate(self.crossword.lengths):
+            
+            #a slot still sharing its length bucket only holds words of the right length
+            if not self.owned[x]:
+                continue
             
             #then iterate over each word in the set of values
-            for word in self.domains[var].copy(): #iterating over a copy so the set doesn't change while iterating
+            for word in self.slot_domains[x].copy(): #iterating over a copy so the set doesn't change while iterating
                 if len(word) == unary_constrain:
                     continue
                 else:
-                    self.domains[var].remove(word)
+                    self.remove_value(x, word)
 
     def revise(self, x, y):
         
         #The purpose of this function is to make variable `x` arc consistent with variable `y` by removing values from 
         #the domain of x for which there is no  possible corresponding value for y in the domain of why.
         
-        #Intitlizing variable with False value and if any change happened it becomes True and then return it
-        revised = False
+        slot_ids = self.crossword.slot_ids
+        return self.revise_slots(slot_ids[x], slot_ids[y])
+
+    def revise_slots(self, x, y):
+        
+        #The purpose of this function is the same as 'revise', for the slots with ids x and y
+        
+        #Building the support index the first time we need it
+        if self.letter_counts is None:
+            self.count_letters()
         
         #Since the overlap is represented by tuple (a,b) and a is the square that the letter in x variable must be the same as b in y
         #variable
-        x_square = self.crossword.overlaps[(x,y)][0]
-        y_square = self.crossword.overlaps[(x,y)][1]
+        x_square, y_square = self.crossword.slot_overlaps[x][y]
+        
+        #If y is assigned, the only letter it supports is the one of its word, whatever is left in its domain
+        value = self.slot_values[y]
+        if value is not None:
+            letter = value[y_square]
+            if not any(count for other, count in self.letter_counts[x][x_square].items() if other != letter):
+                return False
+            self.remove_words(x, [word for word in self.slot_domains[x] if word[x_square] != letter])
+            return True
+        
+        #If y didn't lose a letter at the y square since the last revision, the supports of x still stand
+        stamp = (self.letter_losses[y][y_square], self.restorations)
+        if self.residues.get((x, y)) == stamp:
+            return False
+        self.residues[x, y] = stamp
+        
+        #A word in x is supported as long as at least one word in y has the same letter at the y square, so instead of comparing
+        #words with each other we only look at the letters that x still uses at its square and check their counters in y
+        y_counts = self.letter_counts[y][y_square]
+        unsupported = set(
+            letter for letter, count in self.letter_counts[x][x_square].items()
+            if count and not y_counts[letter]
+        )
+        
+        #If every letter is supported, nothing changes and we didn't have to look at a single word
+        if not unsupported:
+            return False
         
-        #copy_of_domains = self.domains.copy()
+        #Else, we remove every word of x that uses one of the unsupported letters
+        self.remove_words(x, [word for word in self.slot_domains[x] if word[x_square] in unsupported])
+        return True
 
-        #Iterating over each word in the x domain and representing the the sqaure by a variable called letter, then comparing this letter
-        #with each letter in y variable in y sqaure and if once are the same, it is enough to keep that word, else we remove it
-        for word in self.domains[x].copy():
-            letter = word[x_square]
-            result = []
-            
-            for y_word in self.domains[y].copy():
-                if y_word[y_square] == letter:
-                    result.append(True)
-                else:
-                    result.append(False)
-            if any(result):
-                #If we once added True, it is enough to keep the word, so we continue
+    def count_letters(self):
+        
+        #The purpose of this function is to build the support index, for each slot and each position of that slot we count how
+        #many words in the domain have each letter at that position
+        
+        #the counters of a slot that still shares its bucket are shared too, they come from the index of the vocabulary
+        vocabulary = self.crossword.vocabulary
+        self.letter_counts = []
+        for x, (length, words) in enumerate(zip(self.crossword.lengths, self.slot_domains)):
+            if not self.owned[x]:
+                self.letter_counts.append(vocabulary.letter_counts(length))
                 continue
+            counts = [Counter() for _ in range(length)]
+            for word in words:
+                for k, letter in enumerate(word[:length]):
+                    counts[k][letter] += 1
+            self.letter_counts.append(counts)
+        self.letter_losses = [[0] * length for length in self.crossword.lengths]
+        self.residues = {}
+
+    def remove_value(self, x, word):
+        
+        #The purpose of this function is to remove a word from the domain of slot x while keeping the support index in sync
+        
+        self.remove_words(x, (word,))
 
+    def remove_words(self, x, words):
+        
+        #The purpose of this function is to remove words (all in the domain) from the domain of slot x while keeping the support
+        #index in sync, the counters are decremented word by word, unless most of the domain goes, then counting the words
+        #left is cheaper and the old counters go to the trail, so undoing the removal only puts them back
+        
+        if not self.owned[x]:
+            self.own_domain(x)
+        domain = self.slot_domains[x]
+        domain.difference_update(words)
+        saved = None
+        if self.letter_counts is not None:
+            counts = self.letter_counts[x]
+            losses = self.letter_losses[x]
+            if len(words) > len(domain):
+                saved = counts
+                counts = [Counter(word[k] for word in domain) for k in range(len(saved))]
+                for k, (old, new) in enumerate(zip(saved, counts)):
+                    losses[k] += sum(1 for letter, count in old.items() if count and not new[letter])
+                self.letter_counts[x] = counts
             else:
-                #if we didn't add any True, it means we have to remove the word
-                self.domains[x].remove(word)
-                revised = True
-        return revised
+                for word in words:
+                    for k, letter in enumerate(word[:len(counts)]):
+                        counts[k][letter] -= 1
+                        if not counts[k][letter]:
+                            losses[k] += 1
+        if self.trail is not None:
+            self.trail.append((x, words, saved))
+        if self.stats is not None:
+            self.stats.pruned += len(words)
+        self.dirty.add(x)
+
+    def undo(self, mark):
+        
+        #The purpose of this function is to put back every word removed since the trail had `mark` entries, newest first
+        
+        #restored words were never checked against the residues, so they don't hold anymore
+        if len(self.trail) > mark:
+            self.restorations += 1
+        while len(self.trail) > mark:
+            x, words, saved = self.trail.pop()
+            self.slot_domains[x].update(words)
+            self.dirty.add(x)
+            if self.letter_counts is None:
+                continue
+            if saved is not None:
+                self.letter_counts[x] = saved
+                continue
+            counts = self.letter_counts[x]
+            for word in words:
+                for k, letter in enumerate(word[:len(counts)]):
+                    counts[k][letter] += 1
+
+    def domain_size(self, x):
+        
+        #Function that return the number of words left in the domain of slot x, an assigned slot only has its value
+        
+        if self.slot_values[x] is not None:
+            return 1
+        return len(self.slot_domains[x])
+
+    def reduce_domain(self, x, value):
+        
+        #The purpose of this function is to make the propagation see slot x with nothing but its value, with sets there is
+        #nothing to remove: an assigned slot keeps its domain and 'revise_slots', 'domain_size' and 'only_word' read its value
+        #instead, so an assignment does not cost one removal per other word of the domain
+        
+        pass
+
+    def infer(self, x, value):
+        
+        #The purpose of this function is to propagate the assignment of `value` to slot x into the domains of the unassigned
+        #neighbors, every removal goes to the trail so the caller can undo it, returns False if a domain was wiped out
+        
+        self.reduce_domain(x, value)
+        arcs = [
+            (neighbor, x) for neighbor in self.crossword.neighbor_ids[x]
+            if self.slot_values[neighbor] is None
+        ]
+        
+        #Forward checking only revises the neighbors against the new value, and removes the value from the other unassigned
+        #slots of the same length since words are all different, MAC keeps going from there with ac3 and 'all_different_slots'
+        if self.inference == "forward":
+            for y, x in arcs:
+                if self.stats is not None:
+                    self.stats.revisions += 1
+                if self.revise_slots(y, x) and not self.domain_size(y):
+                    self.add_conflict(y, x)
+                    self.wiped = y
+                    return False
+            slot_values = self.slot_values
+            for y in self.crossword.same_length[x]:
+                if slot_values[y] is None and self.discard_word(y, value) and not self.domain_size(y):
+                    self.wiped = y
+                    return False
+            return True
+        return self.maintain_consistency(arcs, [x])
+
+    def maintain_consistency(self, arcs, assigned=()):
+        
+        #The purpose of this function is the same as 'make_consistent' during the search: ac3 from the given arcs, then the
+        #all-different propagation from the slots whose domain changed (they are on the trail) and the `assigned` ones, back
+        #and forth until nothing changes
+        
+        neighbor_ids = self.crossword.neighbor_ids
+        start = len(self.trail)
+        changed = set(assigned)
+        while True:
+            if not self.ac3_slots(arcs):
+                return False
+            changed.update(entry[0] for entry in self.trail[start:])
+            start = len(self.trail)
+            pruned = self.all_different_slots(changed)
+            if pruned is None:
+                return False
+            if not pruned:
+                return True
+            changed = set()
+            arcs = [(z, y) for y in pruned for z in neighbor_ids[y]]
+
+    def all_different_slots(self, changed):
+        
+        #The purpose of this function is to propagate the all-different constraint between the slots of the same length: a
+        #slot left with a single word takes it away from the others (which may leave them with a single word too), and the
+        #slots of a length whose domains changed are checked for enough words to go around ('all_different_violated'), it
+        #returns the set of slots it pruned, or None if the constraint can not be satisfied anymore
+        
+        same_length = self.crossword.same_length
+        slot_values = self.slot_values
+        queue = [y for y in changed if self.domain_size(y) == 1]
+        lengths = {self.crossword.lengths[y] for y in changed}
+        pruned = set()
+        while queue:
+            y = queue.pop()
+            if self.domain_size(y) != 1:
+                continue
+            word = self.only_word(y)
+            for z in same_length[y]:
+                if slot_values[z] is None and self.discard_word(z, word):
+                    size = self.domain_size(z)
+                    if not size:
+                        return None
+                    pruned.add(z)
+                    if size == 1:
+                        queue.append(z)
+        
+        lengths.update(self.crossword.lengths[z] for z in pruned)
+        for length in lengths:
+            if self.all_different_violated(self.crossword.length_slots[length]):
+                return None
+        return pruned
+
+    def all_different_violated(self, slots):
+        
+        #Function that return True if the slots can not all get different words: taking the slots by increasing domain size,
+        #the first k of them must have at least k different words between them (pigeonhole principle), once a domain has as
+        #many words as there are slots, no later prefix can fall short
+        
+        union = set()
+        for k, y in enumerate(sorted(slots, key=self.domain_size), 1):
+            if self.domain_size(y) >= len(slots):
+                return False
+            union.update(self.domain_words(y))
+            if len(union) < k:
+                return True
+        return False
+
+    def discard_word(self, x, word):
+        
+        #The purpose of this function is to remove `word` from the domain of slot x if it is there, it returns True if it was
+        
+        if word not in self.slot_domains[x]:
+            return False
+        self.remove_value(x, word)
+        return True
+
+    def only_word(self, x):
+        
+        #Function that return the word of slot x when its domain has a single one
+        
+        if self.slot_values[x] is not None:
+            return self.slot_values[x]
+        return next(iter(self.slot_domains[x]))
+
+    def domain_words(self, x):
+        
+        #Function that return the words left in the domain of slot x
+        
+        if self.slot_values[x] is not None:
+            return (self.slot_values[x],)
+        return self.slot_domains[x]
 
     def ac3(self, arcs=None):
         #The purpose of this function is to update domain of each variable such that each variable is arc consistent with others
@@ -153,43 +984,78 @@ class CrosswordCreator():
             #Initlize an empty list of arcs if given as None
             arcs = []
             
-            #Iterate over all variables that have an overlap and append them to our list
-            for key, value in self.crossword.overlaps.items():
-                if value is None:
-                    continue
-                else:
-                    arcs.append(key)
-                    
-        #start to iterate, and as long as the arcs list NOT empty, we continoue
-        while len(arcs) != 0:
+            #Iterate over all slots that have an overlap and append them to our list
+            for x, neighbors in enumerate(self.crossword.neighbor_ids):
+                for y in neighbors:
+                    arcs.append((x, y))
+        
+        #Else, the arcs are given as pairs of variables, so we translate them into slot ids
+        else:
+            slot_ids = self.crossword.slot_ids
+            arcs = [(slot_ids[x], slot_ids[y]) for x, y in arcs]
+        
+        return self.ac3_slots(arcs)
+
+    def ac3_slots(self, arcs):
+        
+        #The purpose of this function is the same as 'ac3', with arcs given as pairs of slot ids
+        
+        #The arcs wait in a queue, and a set remembers which ones are already in it so an arc is never queued twice
+        queue = deque(arcs)
+        queued = set(queue)
+        neighbor_ids = self.crossword.neighbor_ids
+        slot_values = self.slot_values
+        
+        #start to iterate, and as long as the queue is NOT empty, we continoue
+        while queue:
             
-            #We start with the first two variables in our list
-            x,y = arcs.pop(0)
+            #We start with the first two variables in our queue, a long propagation still stops when the budget runs out
+            x,y = queue.popleft()
+            queued.discard((x, y))
+            self.check_clock()
+            
+            #An assigned slot has nothing to lose, its word was checked against the assigned neighbors and every unassigned
+            #neighbor was revised against it
+            if slot_values[x] is not None:
+                continue
             
             #Then we check if revision happend, if yes then we go to the next step
-            if self.revise(x,y):
+            if self.stats is not None:
+                self.stats.revisions += 1
+            if self.revise_slots(x,y):
                 
-                #If the domain of the variable X became empty, then we return False, becuase in such a case no solution will be avaiable
-                if self.domains[x] is None:
+                #If the domain of the variable X became empty, then we return False right away, becuase in such a case no
+                #solution will be avaiable
+                if not self.domain_size(x):
+                    self.add_conflict(x, y)
                     return False
                 
-                #Else, we iterate over each neighbor of x, and we add the pair of variables to our list that we want to make consistency,
-                #if we reached the same other variable, we don't add it
-                for var in self.crossword.neighbors(x):
-                    if var == y:
-                        continue
-                    else:
-                        arcs.append((var,x))
+                #Else, we iterate over each neighbor of x, and we add the pair of variables to our queue that we want to make
+                #consistency, if we reached the same other variable or the arc is already waiting, we don't add it
+                for var in neighbor_ids[x]:
+                    if var != y and (var, x) not in queued:
+                        queue.append((var, x))
+                        queued.add((var, x))
         
         #If everything went fine, we return True, it means that our ac3 algorithm, worked fine
         return True
 
+    def add_conflict(self, x, y):
+        
+        #The purpose of this function is to increase the weight of the crossing between slots x and y, because revising one
+        #against the other wiped out a domain
+        
+        self.weights[x][y] += 1
+        self.weights[y][x] += 1
+        self.dirty.add(x)
+        self.dirty.add(y)
+
     def assignment_complete(self, assignment):
         
         #The purpose of this function to check if assignment done for all variables
         
         #Iterate over all variables in our problem
-        for variable in self.domains:
+        for variable in self.crossword.variables:
             
             #check that every variable is in the assignment dict, if one variable not there, return False
             if variable not in assignment:
@@ -198,13 +1064,22 @@ class CrosswordCreator():
         #If everything went fine, return True    
         return True
 
-    def consistent(self, assignment):
+    def consistent(self, assignment, var=None):
         
         #The purpose of this function is to check 3 things:
         #1- That each word was assigned to a variable is unique
         #2- That each word was assigned to a variable has a length same as the variable was assigned to
         #3- That there is no conflict in the overlaping charecters 
         
+        #If we know the only variable that changed, we only have to check that one against the rest
+        if var is not None:
+            value = assignment.pop(var)
+            try:
+                slot_values, used_words = self.assignment_slots(assignment)
+                return self.consistent_slot(self.crossword.slot_ids[var], value, slot_values, used_words)
+            finally:
+                assignment[var] = value
+        
         used_words = []
         
         #Iterate over each variable and word in the assignment dict
@@ -236,150 +1111,622 @@ class CrosswordCreator():
                         if value[i] != other_value[j]:
                             return False
         return True                
-                        
 
-    def order_domain_values(self, var, assignment):
+    def consistent_slot(self, x, value, slot_values, used_words):
+        
+        #The purpose of this function is the same 3 checks as 'consistent', but only for giving `value` to slot x, assuming the
+        #rest of the assignment in slot_values is already consistent, the words used by the other slots are kept in the set
+        #used_words (self.slot_values and self.used_words during the search), so the cost only depends on the number of
+        #neighbors of x
+        
+        if value in used_words or self.crossword.lengths[x] != len(value):
+            return False
+        
+        for y, (i, j) in self.crossword.slot_overlaps[x].items():
+            other_value = slot_values[y]
+            if other_value is not None and value[i] != other_value[j]:
+                return False
+        return True
+
+    def assignment_slots(self, assignment):
+        
+        #The purpose of this function is to translate an assignment dict into a list and a set like the search state:
+        #slot_values[x] is the word of slot x (or None), and used_words is the set of words already taken, the public checks
+        #work on these so they never touch the state of a search that is still going (a suspended 'solutions' generator)
+        
+        slot_values = [None] * len(self.crossword.slots)
+        for var, value in assignment.items():
+            slot_values[self.crossword.slot_ids[var]] = value
+        return slot_values, set(assignment.values())
+
+    def load_assignment(self, assignment):
         
+        #The purpose of this function is to make an assignment dict the search state, see 'assignment_slots'
         
+        self.slot_values, self.used_words = self.assignment_slots(assignment)
+
+    def order_domain_values(self, var, assignment):
         
         #The purpose of this function, is to return the values for a variables in list but sorted by the number of value sthey rule out for
         #the other overlaping variables, by that, the first value in the list, should be the one that rules out the fewest values among
         #other neighbors
         
+        return self.order_slot_values(self.crossword.slot_ids[var])
+
+    def order_slot_values(self, x):
+        
+        #The purpose of this function is the same as 'order_domain_values' for slot x, a value rules out every word of a neighbor
+        #that has a different letter at the shared square, so for each neighbor that is its domain size minus the support counter
+        #of the letter the value puts there
+        
+        if self.letter_counts is None:
+            self.count_letters()
+        
         #Initiating an empty dict, with each value in that var domain, with value 0
-        values_counter = {}
+        values_counter = dict.fromkeys(self.slot_domains[x], 0)
         
-        for value in self.domains[var]:
-            values_counter[value] = 0
-            
-            
-        #Iterating over all the values in that variable domain
-        for value in self.domains[var]:
-            
-            #then, iterating over each variable that is considered a neighbor of that variable
-            for variable in self.crossword.neighbors(var):
-                
-                #after that, we iterate over each value in each neighbor variable
-                for other_value in self.domains[variable]:
-                    
-                    #if there is and overlap between these two variables (the main variable and the neighbor var), we check there is a
-                    #conflict and the value (our main value) is effected by that neighbor value, we increase that value counter by one
-                    if self.crossword.overlaps[(var, variable)]:
-                        
-                        i,j = self.crossword.overlaps[var,variable]
-                        
-                        if value[i] != other_value[j]:
-                                                   
-                            values_counter[value] +=1
+        #then, iterating over each slot that is considered a neighbor of that slot, and counting the words each value rules out,
+        #an assigned neighbor rules out the same words for every value (none, once x was revised against it)
+        slot_values = self.slot_values
+        for y, (i, j) in self.crossword.slot_overlaps[x].items():
+            if slot_values[y] is not None:
+                continue
+            size = self.domain_size(y)
+            counts = self.letter_counts[y][j]
+            for value in values_counter:
+                values_counter[value] += size - counts[value[i]]
                          
-        #after finishing our main loop, we returnt sorted list for that variable values, using the values counter as key
-        return sorted([value for value in values_counter], key=lambda value: values_counter[value])
+        #after finishing our main loop, we returnt sorted list for that variable values, using the values counter as key, ties
+        #are broken alphabetically so the search does not depend on the iteration order of the sets, or by a hash of the word
+        #salted by the seed when the ties are randomized
+        if self.salt is None:
+            return sorted(values_counter, key=lambda value: (values_counter[value], value))
+        salt = self.salt
+        return sorted(values_counter, key=lambda value: (values_counter[value], crc32(value.encode(), salt)))
 
-    def select_unassigned_variable(self, assignment, start_value = 1):
+    def select_unassigned_variable(self, assignment):
         
         #The purpose of this function is choose a variable that is NOT choosen yet in our assignment, the variable should be the one
         #with the fewest words remaining in its values, if a tie exist, the variabel choosen must be the one with highest number of 
         #neigbors, if tie exist return any variable from the tied variabels
         
-        #Initiating an empty list that will contain our result(s)
-        result = []
+        slot_values, _ = self.assignment_slots(assignment)
+        prospect_slots = [x for x, value in enumerate(slot_values) if value is None]
+        if not prospect_slots:
+            return None
+        return self.crossword.slots[min(prospect_slots, key=lambda x: self.slot_key(x, slot_values))]
+
+    def select_unassigned_slot(self):
         
-        #Initiating an empty dict that will contain our prospect variabels
-        prospect_variables = {}
+        #The purpose of this function is the same as 'select_unassigned_variable' during the search, it refreshes the keys of
+        #the slots whose domain changed and pops the best slot from the heap, returning None once every slot is assigned, the
+        #search pushes the slot back if it has to backtrack over it
         
-        #Iterating over each variable in the domain of our problem, if the variable exists in our assignment, we ignore it, if doesn't
-        #we append it to our prospet variabels dict
-        for variable,value in self.domains.items():
-            
-            if variable in assignment:
-                continue
-            else:
-                prospect_variables[variable] = value
-                
-        #Iterating over each variable in our prospect dict, and starting with a value equals = 1 (because 1 is the fewest number of words), 
-        #if the len of that variable value (the same as the number of remaining words) is equal to our starting value, we append it to the 
-        #list result(s)
-        for key, value in prospect_variables.items():
-            if len(value) == start_value:
-                result.append(key)
-        
-        #if after that the len of that list is 0, it means no variable met our value, so we recrusivly call the function again but we will 
-        #increase the number of words to 2
-        if len(result) == 0:
-            return self.select_unassigned_variable(assignment,(start_value+1))
-        
-        #if result(s) contains value:
-        else:
-            
-            #if there is more than one value, it means a tie, so we move to the next standard wich is the number of neighbors
-            if len(result) > 1:
-                neighbors_counter = {}
-                
-                #iterating over each variable in our list, and puting the number of neighbors to that variabels in a dict
-                for var in result:
-                    neighbors_counter[var] = len(self.crossword.neighbors(var))
-                
-                #return the one with the max number of neighbors
-                return max(neighbors_counter, key=neighbors_counter.get)
-            
-            #if the len of result is not bigger than one, then returning the only variable 
-            else:
-                return result[0]
+        heap = self.heap
+        for x in self.dirty:
+            if x in heap:
+                heap.update(x, self.slot_key(x, self.slot_values))
+        self.dirty.clear()
+        return heap.pop() if heap else None
+
+    def slot_key(self, x, slot_values):
+        
+        #Function that return the key of slot x for the chosen heuristic when the slots are assigned as in slot_values (the
+        #search passes self.slot_values), smaller keys are picked first
+        
+        if self.tiebreak is None:
+            return self.heuristic_key(self, x, slot_values)
+        return self.heuristic_key(self, x, slot_values) + (self.tiebreak[x],)
+
+    def touch_neighbors(self, x):
+        
+        #The purpose of this function is to mark the neighbors of x dirty when x gets assigned or unassigned, dom/wdeg only
+        #counts the weights of crossings with unassigned slots
+        
+        if self.heuristic == "domwdeg":
+            self.dirty.update(self.crossword.neighbor_ids[x])
 
     def backtrack(self, assignment):
         
         #The purpose of this function is take partial assignment as using backtrack search return full assignment if possible,
         #if no possible assignment, return None
         
-        #firstly, we check if the assignment given is complete, if so, we return it
-        if self.assignment_complete(assignment):
-            return assignment
-        
-        #we choose an assigned variable to work with using the function 'select_unassigned_variable'
-        var = self.select_unassigned_variable(assignment)
+        if self.restarts:
+            found = self.search_restarts(assignment)
+        else:
+            self.start_search(assignment)
+            found = self.search()
+        if not found:
+            return None
         
-        #then we iterate over the values (words) of that variable, and we assign one of these values to the assignment
-        for value in self.order_domain_values(var, assignment):
+        #translating the complete list back into the assignment dict
+        for var, value in zip(self.crossword.slots, self.slot_values):
             assignment[var] = value
-            
-            #we check if that assignmet is consistent using the function 'consistent'
-            if self.consistent(assignment):
-                
+        return assignment
+
+    def search_restarts(self, assignment):
+        
+        #The purpose of this function is the same as 'search', but the search starts over from `assignment` every time it
+        #failed (a slot ran out of values) more often than the cap of its run: run k may fail RESTART_SCALE * luby(k) times,
+        #with new random ties each time, so one bad early choice can not hold the whole search, the nogoods learned in a run
+        #stay valid and are kept, and so are the dom/wdeg weights if keep_weights is set
+        
+        #the caps grow without bound, so a run eventually ends on its own, with a solution or the proof there is none
+        run = 1
+        try:
+            while True:
+                if run > 1 and not self.keep_weights:
+                    self.weights = [dict.fromkeys(neighbors, 1) for neighbors in self.crossword.neighbor_ids]
+                self.start_search(assignment)
+                self.next_restart = self.failures + self.RESTART_SCALE * luby(run)
+                try:
+                    return self.search()
+                except SearchInterrupted as interruption:
+                    if interruption.reason != "restart":
+                        raise
                 
-                #then we call recrusivly the backtrack function on the new assignment
-                result = self.backtrack(assignment)
+                #the removals of the run are undone, the domains are back to what the search started from
+                if self.trail:
+                    self.undo(0)
+                if self.stats is not None:
+                    self.stats.restarts += 1
+                run += 1
+        finally:
+            self.next_restart = float("inf")
+
+    def solutions(self, limit=None):
+        
+        #The purpose of this function is to yield the complete assignments of the crossword one by one, as the search finds
+        #them, every next solution continues the same search from where the previous one was found, so asking for the second
+        #or third fill only costs the extra nodes, `limit` stops after that many solutions
+        
+        #like 'solve', the search starts from node and arc consistent domains
+        if limit is not None and limit <= 0:
+            return
+        if not self.prepare():
+            return
+        self.start_search(dict())
+        
+        count = 0
+        for _ in self.timed_solutions():
+            yield dict(zip(self.crossword.slots, self.slot_values))
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+    def count_solutions(self, limit=None):
+        
+        #Function that return the number of solutions of the crossword (up to `limit`), it runs the same search as 'solutions'
+        #without building an assignment for each solution
+        
+        if limit is not None and limit <= 0:
+            return 0
+        if not self.prepare():
+            return 0
+        self.start_search(dict())
+        
+        count = 0
+        for _ in self.timed_solutions():
+            count += 1
+            if limit is not None and count >= limit:
+                break
+        return count
+
+    def timed_solutions(self):
+        
+        #The purpose of this function is the same as 'search_solutions', adding the time spent searching to the "search" phase
+        #when statistics are collected, but not the time the caller spends between two solutions
+        
+        solutions = self.search_solutions()
+        while True:
+            try:
+                yield self.run_phase("search", next, solutions)
+            except StopIteration:
+                return
+
+    def start_search(self, assignment):
+        
+        #The purpose of this function is to set up the search state from a partial assignment
+        
+        #the search runs on slot ids: the assignment becomes a list indexed by slot id, plus the set of words already used, so
+        #each node only checks the slot it assigned
+        self.load_assignment(assignment)
+        
+        #when an inference is used, the removals it makes are recorded on the trail
+        if self.inference and self.trail is None:
+            self.trail = []
+        
+        #the unassigned slots go into the heap the search picks from
+        self.heap = IndexedHeap(len(self.crossword.slots))
+        for x, value in enumerate(self.slot_values):
+            if value is None:
+                self.heap.push(x, self.slot_key(x, self.slot_values))
+        self.dirty.clear()
+        self.deepest = None
+        self.deepest_depth = -1
+        self.pruned_by = [set() for _ in self.crossword.slots]
+        if self.random is not None:
+            self.shuffle_ties()
+        self.schedule_check()
+
+    def shuffle_ties(self):
+        
+        #The purpose of this function is to draw a new random order for the ties of the heuristics, from the seed, before the
+        #heap of the search is built
+        
+        self.tiebreak = [self.random.random() for _ in self.crossword.slots]
+        self.salt = self.random.getrandbits(32)
+
+    def search(self):
+        
+        #The purpose of this function is the recursive part of 'backtrack', it returns True once self.slot_values is complete,
+        #the search is left where it found the solution
+        
+        for _ in self.search_solutions():
+            return True
+        return False
+
+    def search_solutions(self):
+        
+        #The purpose of this function is to run the search as a generator, it yields every time self.slot_values is complete
+        #and, when resumed, backtracks from there to look for the next solution, with backjumping its return value is the
+        #conflict set of the failure (see 'conflict_set')
+        
+        #we count the node, and every now and then we check if the budget ran out or someone asked us to stop
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self.check_budget()
+        
+        #we remember the deepest assignment, it is what a search that runs out of budget gives back
+        depth = len(self.used_words)
+        if depth > self.deepest_depth:
+            self.deepest_depth = depth
+            self.deepest = list(self.slot_values)
+        stats = self.stats
+        if stats is not None:
+            stats.visit(self.nodes, depth)
+        
+        #we choose an assigned slot to work with, if there is none left, the assignment is complete
+        x = self.select_unassigned_slot()
+        if x is None:
+            self.solutions_found += 1
+            yield
+            return None
+        
+        #with backjumping, we collect the slots responsible for rejecting each value of x, a solution found below x means
+        #the failures are not x's fault anymore, so we remember how many were found before
+        backjumping = self.backjumping
+        conflicts = set() if backjumping else None
+        solutions_found = self.solutions_found
+        
+        #then we iterate over the values (words) of that slot, and we assign one of these values to the assignment
+        if stats is None:
+            values = self.order_slot_values(x)
+        else:
+            values = stats.timed("ordering", self.order_slot_values, x)
+        for value in values:
+            
+            #we check if that assignmet is consistent, only x changed since the last check, then if it completes a nogood, with
+            #backjumping the check also tells which slot is in the way
+            if not backjumping:
+                if not self.consistent_slot(x, value, self.slot_values, self.used_words):
+                    continue
+            else:
+                culprit = self.conflicting_slot(x, value)
+                if culprit is not None:
+                    conflicts.add(culprit)
+                    continue
+                if self.nogoods is not None:
+                    culprits = self.nogoods.conflict(x, value, self.slot_values)
+                    if culprits is not None:
+                        conflicts.update(culprits)
+                        continue
+            self.slot_values[x] = value
+            self.touch_neighbors(x)
                 
-                #we check if that call does return True, if so, it means that the assignment is complete, so we return it
-                if result:
-                    return result
+            #we propagate the new value into the neighbors, remembering where the trail was so we can undo it
+            if self.inference:
+                mark = len(self.trail)
+                if stats is None:
+                    consistent = self.infer(x, value)
+                else:
+                    consistent = stats.timed("propagation", self.infer, x, value)
+                if not consistent:
+                    
+                    #forward checking wiped out a domain, the slots that pruned it share the blame with x
+                    if backjumping and self.inference == "forward":
+                        conflicts.update(self.pruned_by[self.wiped])
+                    self.undo(mark)
+                    self.slot_values[x] = None
+                    self.touch_neighbors(x)
+                    continue
+                if backjumping:
+                    pruned = self.record_pruning(x, mark)
+            
+            #then we search recrusivly from the new assignment, passing up every solution found below it
+            self.used_words.add(value)
+            below = yield from self.search_solutions()
+            self.used_words.remove(value)
             
-            #we remove that variable after we worked with it
-            assignment.pop(var)
+            #then we put back the words the propagation removed, and we remove that value after we worked with it
+            if self.inference:
+                if backjumping:
+                    for y in pruned:
+                        self.pruned_by[y].discard(x)
+                self.undo(mark)
+            self.slot_values[x] = None
+            self.touch_neighbors(x)
+            
+            #if x is not to blame for the failure below, no other value of x can fix it, so we jump back over x
+            if backjumping and self.solutions_found == solutions_found:
+                if x not in below:
+                    if stats is not None:
+                        stats.backjumps += 1
+                    self.heap.push(x, self.slot_key(x, self.slot_values))
+                    return below
+                conflicts.update(below)
+        
+        #once every value was tried, x goes back to the heap, there is no other solution from this point, with restarts a run
+        #that failed too often stops here, after learning from its last failure
+        if stats is not None:
+            stats.backtracks += 1
+        self.heap.push(x, self.slot_key(x, self.slot_values))
+        if backjumping:
+            conflicts = self.conflict_set(x, conflicts, solutions_found)
+        self.failures += 1
+        if self.failures >= self.next_restart:
+            raise SearchInterrupted("restart")
+        return conflicts
+
+    def conflicting_slot(self, x, value):
+        
+        #Function that return an assigned slot that makes giving `value` to slot x inconsistent (the slot already using that
+        #word, or a neighbor with a different letter on the shared square), or None if the value is consistent
         
-        #if no assignment is possible, return None, it means no solution for this puzzle
+        slot_values = self.slot_values
+        if value in self.used_words:
+            return slot_values.index(value)
+        for y, (i, j) in self.crossword.slot_overlaps[x].items():
+            other_value = slot_values[y]
+            if other_value is not None and value[i] != other_value[j]:
+                return y
         return None
 
+    def record_pruning(self, x, mark):
+        
+        #The purpose of this function is to remember that the assignment of slot x removed the words on the trail after
+        #`mark`, it returns the slots it pruned so they can be forgotten when x is unassigned
+        
+        pruned = {entry[0] for entry in self.trail[mark:]}
+        pruned.discard(x)
+        for y in pruned:
+            self.pruned_by[y].add(x)
+        return pruned
+
+    def conflict_set(self, x, conflicts, solutions_found):
+        
+        #Function that return the conflict set of slot x once every value failed: the assigned slots whose words leave x
+        #without a value, plus the ones that pruned its domain, the words they hold are learned as a nogood
+        
+        #MAC removals depend on the whole assignment, and a solution below x means its failures are not a dead end, in both
+        #cases every assigned slot is to blame, which makes the search backtrack chronologically
+        if self.inference == "mac" or self.solutions_found != solutions_found:
+            conflicts = {y for y, value in enumerate(self.slot_values) if value is not None}
+        else:
+            conflicts.update(self.pruned_by[x])
+        conflicts.discard(x)
+        if self.nogoods is not None and self.solutions_found == solutions_found:
+            self.nogoods.add((y, self.slot_values[y]) for y in conflicts)
+        return conflicts
+
+
+def make_creator(crossword, engine="sets", **options):
+    
+    #Function that return a creator for the crossword using the given domain engine ("sets" or "numpy"), the other keyword
+    #arguments are passed to the creator
+    
+    if engine == "numpy":
+        from numpy_engine import NumpyCrosswordCreator
+        return NumpyCrosswordCreator(crossword, **options)
+    if engine != "sets":
+        raise ValueError(f"unknown engine {engine!r}")
+    return CrosswordCreator(crossword, **options)
+
+
+def serialize_assignment(assignment):
+    
+    #Function that return an assignment as a list of JSON friendly dicts, one per variable in grid order
+    
+    return [
+        {"i": var.i, "j": var.j, "direction": var.direction, "length": var.length, "word": word}
+        for var, word in sorted(assignment.items(), key=lambda item: (item[0].i, item[0].j, item[0].direction))
+    ]
+
+
+#Event shared by the workers of 'solve_parallel', set by 'init_worker' in each worker process
+worker_cancel = None
+
+
+def init_worker(cancel):
+    
+    #Function that run once in each worker process of 'solve_parallel'
+    
+    global worker_cancel
+    worker_cancel = cancel
+
+
+def solve_chunk(creator_class, crossword, options, x, words, budget=(None, None)):
+    
+    #The purpose of this function is to run in a worker process and search for a solution where slot x takes one of `words`
+    #(any word if x is None), it returns the list of words indexed by slot id, or None if there is no solution or the search was cancelled, or a
+    #TimedOut if the (deadline, node limit) budget ran out, along with the number of nodes the search expanded
+    
+    creator = creator_class(crossword, **options)
+    deadline, node_limit = budget
+    creator.set_budget(deadline=deadline, node_limit=node_limit, cancel=worker_cancel)
+    if creator.cancel is not None and creator.cancel.is_set():
+        return None, 0
+    creator.enforce_node_consistency()
+    if x is not None:
+        creator.restrict_domain(x, words)
+    try:
+        if not creator.make_consistent():
+            return None, creator.nodes
+        if creator.backtrack(dict()) is None:
+            return None, creator.nodes
+    except SearchInterrupted as interruption:
+        if interruption.reason == "cancelled":
+            return None, creator.nodes
+        return TimedOut(interruption.reason, creator.partial_assignment(), creator.nodes), creator.nodes
+    return creator.slot_values, creator.nodes
+
 
 def main():
 
     
 
     # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
+    parser = argparse.ArgumentParser(description="Generate a crossword puzzle.")
+    parser.add_argument("structure", help="structure file of the crossword")
+    parser.add_argument("words", help="vocabulary file, one word per line")
+    parser.add_argument(
+        "--engine", choices=("sets", "numpy"), default="sets",
+        help="domain engine used by the solver (default: sets)"
+    )
+    parser.add_argument(
+        "--inference", choices=("none", "forward", "mac"), default="none",
+        help="propagation after each assignment (default: none)"
+    )
+    parser.add_argument(
+        "--heuristic", choices=sorted(HEURISTICS), default="degree",
+        help="variable ordering: mrv, mrv with degree ties, or dom/wdeg (default: degree)"
+    )
+    parser.add_argument(
+        "--no-backjumping", action="store_true",
+        help="backtrack chronologically instead of jumping back to the cause of a failure"
+    )
+    parser.add_argument(
+        "--restarts", action="store_true",
+        help="start the search over with new random tie-breaks when it keeps failing, on a Luby schedule"
+    )
+    parser.add_argument(
+        "--seed", type=int,
+        help="seed of the random tie-breaks, the same seed gives the same search (default: 0 with --restarts)"
+    )
+    parser.add_argument(
+        "--no-decompose", action="store_true",
+        help="search the whole grid at once instead of one group of crossing slots at a time"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="number of processes the search is split between (default: 1)"
+    )
+    parser.add_argument(
+        "--count", action="store_true",
+        help="print the number of solutions instead of a solution"
+    )
+    parser.add_argument(
+        "--limit", type=int,
+        help="with --count, stop counting at this number, else print up to this number of solutions"
+    )
+    parser.add_argument(
+        "--stats", action="store_true",
+        help="print the search statistics and the time of each phase to stderr"
+    )
+    parser.add_argument(
+        "--output",
+        help="also save the solution as an image, SVG if the name ends with .svg, else PNG"
+    )
+    parser.add_argument(
+        "--timeout", type=float,
+        help="stop the search after this many seconds and print the deepest partial assignment"
+    )
+    parser.add_argument(
+        "--max-nodes", type=int,
+        help="stop the search after this many nodes and print the deepest partial assignment"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="always search, instead of reusing the result of an earlier solve of the same grid and words"
+    )
+    parser.add_argument(
+        "--pin", action="append", default=[], metavar="I,J,DIRECTION=WORD",
+        help="fix the word of the slot starting at row I, column J, going across or down (can be repeated)"
+    )
+    args = parser.parse_args()
     
 
     # Generate crossword
-    crossword = Crossword(structure, words)
-    creator = CrosswordCreator(crossword)
-    assignment = creator.solve()
+    crossword = Crossword(args.structure, args.words)
+    pins = dict()
+    for pin in args.pin:
+        try:
+            start, word = pin.split("=")
+            i, j, direction = start.split(",")
+            var = next(
+                var for var in crossword.variables
+                if (var.i, var.j, var.direction) == (int(i), int(j), direction.strip().lower())
+            )
+        except (ValueError, StopIteration):
+            parser.error(f"--pin {pin}: no slot starts there, expected I,J,across=WORD or I,J,down=WORD")
+        pins[var] = word.strip().upper()
+    if pins and (args.count or args.limit is not None):
+        parser.error("--pin can not be used with --count or --limit")
+    inference = None if args.inference == "none" else args.inference
+    creator = make_creator(
+        crossword, args.engine, inference=inference, heuristic=args.heuristic,
+        backjumping=not args.no_backjumping, decompose=not args.no_decompose,
+        restarts=args.restarts, seed=args.seed
+    )
+    if args.stats:
+        creator.stats = SearchStats()
+    creator.set_budget(timeout=args.timeout, node_limit=args.max_nodes)
+    try:
 
-    # Print result
-    if assignment is None:
-        print("No solution.")
-    else:
-        creator.print(assignment)
+        # Count or enumerate the solutions if asked to
+        if args.count:
+            print(creator.count_solutions(args.limit))
+            return
+        if args.limit is not None:
+            count = 0
+            for count, assignment in enumerate(creator.solutions(args.limit), 1):
+                if count > 1:
+                    print()
+                creator.print(assignment)
+            if not count and args.limit > 0:
+                print("No solution.")
+            return
         
+        #A grid solved before with the same words is answered from the cache, a search that ran out of budget is not
+        #cached since it proves nothing
+        #the cache does not know about pins, a pinned grid is always searched
+        def search():
+            return creator.solve(workers=args.workers, deadline=creator.deadline, node_limit=args.max_nodes)
+        if pins:
+            try:
+                assignment = creator.resolve(dict(), pins, deadline=creator.deadline, node_limit=args.max_nodes)
+            except ValueError as error:
+                parser.error(str(error))
+        elif args.no_cache:
+            assignment = search()
+        else:
+            assignment, _ = SolutionCache().solve(crossword, search)
+
+        # Print result
+        if isinstance(assignment, TimedOut):
+            print(f"Search stopped ({assignment.reason}), deepest partial assignment:")
+            creator.print(assignment.partial)
+        elif assignment is None:
+            print("No solution.")
+        else:
+            creator.print(assignment)
+            if args.output:
+                creator.create_image(assignment, args.output)
+    except SearchInterrupted as interruption:
+        print(f"Search stopped ({interruption.reason}) after {creator.nodes} nodes.")
+    finally:
+        if args.stats:
+            print(creator.stats, file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+class IndexedHeap():
+    """Binary min-heap of the integers 0..size-1 whose keys can change."""
+
+    def __init__(self, size):
+        """Create an empty heap for items 0 to size - 1."""
+        self.entries = []
+        self.position = [-1] * size
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, item):
+        return self.position[item] >= 0
+
+    def push(self, item, key):
+        """Add an item that is not in the heap yet."""
+        self.entries.append((key, item))
+        self.position[item] = len(self.entries) - 1
+        self._sift_up(len(self.entries) - 1)
+
+    def pop(self):
+        """Remove and return the item with the smallest key."""
+        item = self.entries[0][1]
+        self.remove(item)
+        return item
+
+    def update(self, item, key):
+        """Change the key of an item in the heap."""
+        index = self.position[item]
+        old_key = self.entries[index][0]
+        self.entries[index] = (key, item)
+        if key < old_key:
+            self._sift_up(index)
+        else:
+            self._sift_down(index)
+
+    def remove(self, item):
+        """Remove an item from the heap."""
+        index = self.position[item]
+        last = self.entries.pop()
+        self.position[item] = -1
+        if index < len(self.entries):
+            self.entries[index] = last
+            self.position[last[1]] = index
+            self._sift_up(index)
+            self._sift_down(self.position[last[1]])
+
+    def _sift_up(self, index):
+        entries = self.entries
+        entry = entries[index]
+        while index > 0:
+            parent = (index - 1) // 2
+            if entries[parent] <= entry:
+                break
+            entries[index] = entries[parent]
+            self.position[entries[index][1]] = index
+            index = parent
+        entries[index] = entry
+        self.position[entry[1]] = index
+
+    def _sift_down(self, index):
+        entries = self.entries
+        size = len(entries)
+        entry = entries[index]
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and entries[child + 1] < entries[child]:
+                child += 1
+            if entry <= entries[child]:
+                break
+            entries[index] = entries[child]
+            self.position[entries[index][1]] = index
+            index = child
+        entries[index] = entry
+        self.position[entry[1]] = index
+
+
+# Variable ordering heuristics: each one maps a slot id of a
+# CrosswordCreator, with the slots assigned as in slot_values, to a key,
+# the unassigned slot with the smallest key is assigned next
+
+def mrv(creator, x, slot_values):
+    """Minimum remaining values: the slot with the fewest words left."""
+    return (creator.domain_size(x),)
+
+
+def mrv_degree(creator, x, slot_values):
+    """MRV, breaking ties with the highest number of crossings."""
+    return (creator.domain_size(x), -len(creator.crossword.neighbor_ids[x]))
+
+
+def dom_wdeg(creator, x, slot_values):
+    """Domain size divided by the summed conflict weights of the crossings
+    with unassigned slots (dom/wdeg)."""
+    wdeg = sum(
+        weight for y, weight in creator.weights[x].items()
+        if slot_values[y] is None
+    )
+    return (creator.domain_size(x) / (wdeg or 1),)
+
+
+HEURISTICS = {
+    "mrv": mrv,
+    "degree": mrv_degree,
+    "domwdeg": dom_wdeg,
+}
+
+
+def luby(i):
+    """Return the i-th term (from 1) of the Luby sequence 1, 1, 2, 1, 1, 2,
+    4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+
+    Restarting after luby(k) units of work in run k is within a
+    logarithmic factor of the best schedule, whatever the distribution of
+    the run times."""
+    while True:
+        k = i.bit_length()
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
@@ -0,0 +1,153 @@
+"""Load test a running server.py and report its latency percentiles.
+
+Requests are taken in turn from a batch.py manifest (or a single
+structure and words file) and sent by `--concurrency` clients at once,
+until `--requests` have been answered. Latencies are measured by the
+client, from connecting to reading the whole response, so they include
+the time spent waiting for a worker.
+
+A 503 (the server is full) is retried after a random backoff, doubled at
+each retry, up to `--retries` times, and the latency of the request runs
+until its final answer. Percentiles are reported for each status apart,
+so answers refused at once do not pass for fast solves.
+
+Usage: python loadtest.py (manifest.jsonl | --structure FILE --words FILE) [--requests N] [--concurrency N] [--retries N]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from collections import Counter
+
+from batch import read_manifest
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Seconds before the first retry of a 503, doubled at each retry up to
+# MAX_BACKOFF
+BACKOFF = 0.05
+MAX_BACKOFF = 2.0
+
+
+async def post(path, payload, host="127.0.0.1", port=8765, unix=None):
+    """Send a request to the server, return its (status, payload)."""
+    if unix is not None:
+        reader, writer = await asyncio.open_unix_connection(unix)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    try:
+        body = json.dumps(payload).encode() if payload is not None else b""
+        method = "POST" if payload is not None else "GET"
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            header = await reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await reader.readexactly(length))
+    finally:
+        writer.close()
+
+
+def percentile(values, p):
+    """Return the p-th percentile of sorted values (nearest rank)."""
+    if not values:
+        return float("nan")
+    rank = max(1, -(-len(values) * p // 100))
+    return values[rank - 1]
+
+
+async def run(jobs, requests, concurrency, retries=5, **address):
+    """Send `requests` requests, return (latencies, outcomes, retried,
+    seconds), the latencies being sorted lists by status."""
+    latencies = {}
+    outcomes = Counter()
+    retried = 0
+    cycle = itertools.cycle(jobs)
+    remaining = itertools.count()
+
+    async def client():
+        nonlocal retried
+        while next(remaining) < requests:
+            job = dict(next(cycle))
+            start = time.perf_counter()
+            backoff = BACKOFF
+            for attempt in range(retries + 1):
+                try:
+                    status, result = await post("/solve", job, **address)
+                except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as error:
+                    outcomes[type(error).__name__] += 1
+                    break
+                if status == 503 and attempt < retries:
+                    retried += 1
+                    await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+                    backoff = min(2 * backoff, MAX_BACKOFF)
+                    continue
+                latencies.setdefault(status, []).append(time.perf_counter() - start)
+                outcomes[f"{status} {result.get('status', result.get('error', ''))}"] += 1
+                break
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    latencies = {status: sorted(values) for status, values in latencies.items()}
+    return latencies, outcomes, retried, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a crossword server.")
+    parser.add_argument("manifest", nargs="?", help="JSONL file of jobs, as for batch.py")
+    parser.add_argument("--structure", help="structure file, instead of a manifest")
+    parser.add_argument("--words", help="words file, instead of a manifest")
+    parser.add_argument("--requests", type=int, default=100, help="number of requests (default: 100)")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight (default: 4)")
+    parser.add_argument("--retries", type=int, default=5, help="retries of a request answered 503 (default: 5)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="connect to a Unix socket instead")
+    args = parser.parse_args()
+
+    if args.manifest:
+        with open(args.manifest) as f:
+            jobs = read_manifest(f)
+    elif args.structure and args.words:
+        jobs = [{"structure": args.structure, "words": args.words}]
+    else:
+        parser.error("give a manifest, or --structure and --words")
+    for job in jobs:
+        job.pop("id", None)
+
+    latencies, outcomes, retried, elapsed = asyncio.run(run(
+        jobs, args.requests, args.concurrency, args.retries,
+        host=args.host, port=args.port, unix=args.unix
+    ))
+
+    solved = latencies.get(200, [])
+    print(
+        f"{sum(outcomes.values())} requests in {elapsed:.3f}s, {len(solved) / elapsed:.1f} answered/s, "
+        f"{retried} retries after a 503"
+    )
+    for outcome, count in sorted(outcomes.items()):
+        print(f"  {outcome}: {count}")
+    for status, values in sorted(latencies.items()):
+        cells = [f"p{p} {percentile(values, p) * 1000:.1f}ms" for p in PERCENTILES]
+        cells.append(f"max {values[-1] * 1000:.1f}ms")
+        print(f"{status}: " + ", ".join(cells))
+    if not solved:
+        sys.exit("no request was answered with 200")
+
+
+if __name__ == "__main__":
+    main()
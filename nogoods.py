@@ -0,0 +1,52 @@
+from collections import OrderedDict
+
+
+class NogoodStore():
+    """Bounded store of nogoods learned by the search.
+
+    A nogood is a set of (slot, word) pairs that cannot all be part of a
+    solution. The store keeps at most `capacity` of them with at most
+    `max_size` pairs each, evicting the least recently used one when full.
+    """
+
+    def __init__(self, capacity=10000, max_size=3):
+        """Create an empty store."""
+        self.capacity = capacity
+        self.max_size = max_size
+        self.nogoods = OrderedDict()
+        self.index = {}
+
+    def __len__(self):
+        return len(self.nogoods)
+
+    def add(self, pairs):
+        """Record a nogood given as (slot, word) pairs, unless it is empty,
+        too big or already known."""
+        nogood = frozenset(pairs)
+        if not nogood or len(nogood) > self.max_size or nogood in self.nogoods:
+            return
+        self.nogoods[nogood] = None
+        # The nogoods of a pair are kept in a dict rather than a set, so
+        # they are tried in the order they were learned, whatever the hash seed
+        for pair in nogood:
+            self.index.setdefault(pair, {})[nogood] = None
+        if len(self.nogoods) > self.capacity:
+            self.remove(next(iter(self.nogoods)))
+
+    def remove(self, nogood):
+        """Forget a nogood."""
+        del self.nogoods[nogood]
+        for pair in nogood:
+            nogoods = self.index[pair]
+            del nogoods[nogood]
+            if not nogoods:
+                del self.index[pair]
+
+    def conflict(self, x, value, slot_values):
+        """Return the other slots of a nogood that giving `value` to slot x
+        would complete, given the words of slot_values, or None."""
+        for nogood in self.index.get((x, value), ()):
+            if all(slot_values[y] == word for y, word in nogood if y != x):
+                self.nogoods.move_to_end(nogood)
+                return [y for y, _ in nogood if y != x]
+        return None
@@ -0,0 +1,153 @@
+from bisect import bisect_left
+
+import numpy as np
+
+from crossword import *
+from generate import CrosswordCreator
+
+
+class NumpyCrosswordCreator(CrosswordCreator):
+
+    def make_domains(self):
+
+        #initiating the creator with a vectorized representation of the vocabulary: every word length gets its own uint8 matrix
+        #(one row per word, one column per letter) and every domain becomes a boolean mask over the rows of its length matrix,
+        #the trail then holds (slot, removed rows) pairs, so undoing a removal is a single mask assignment
+
+        #Letters are encoded as their byte in the vocabulary, so the matrix of each length is read straight from the
+        #vocabulary, which memory maps it when the words file was compiled
+        vocabulary = self.crossword.vocabulary
+        self.words = {}
+        self.matrix = {}
+        for length in set(self.crossword.lengths):
+            self.words[length] = vocabulary.words(length)
+            self.matrix[length] = np.frombuffer(
+                vocabulary.word_bytes(length), dtype=np.uint8
+            ).reshape(vocabulary.count(length), length)
+
+        #The unary constraint is already satisfied by picking the matrix of the right length, so every mask starts full
+        return [
+            np.ones(len(self.words[length]), dtype=bool)
+            for length in self.crossword.lengths
+        ]
+
+    def domain_words(self, x):
+
+        #The purpose of this function is to decode the mask of slot x back into the list of its words
+        words = self.words[self.crossword.lengths[x]]
+        return [words[k] for k in np.flatnonzero(self.slot_domains[x])]
+
+    def letter_histogram(self, x, square):
+
+        #The purpose of this function is to count, for every letter of the alphabet, how many words left in the domain of slot x
+        #have that letter at the given square
+        column = self.matrix[self.crossword.lengths[x]][self.slot_domains[x], square]
+        return np.bincount(column, minlength=256)
+
+    def enforce_node_consistency(self):
+
+        #Every mask is built over the words of its slot length, so there is nothing left to remove here
+        return
+
+    def revise_slots(self, x, y):
+
+        #The purpose of this function is the same as in the set engine, but the letters supported by y are found with one
+        #histogram over its column and the unsupported words of x are dropped with one mask operation
+        x_square, y_square = self.crossword.slot_overlaps[x][y]
+        supported = self.letter_histogram(y, y_square) > 0
+        keep = supported[self.matrix[self.crossword.lengths[x]][:, x_square]]
+
+        removed = self.slot_domains[x] & ~keep
+        if not removed.any():
+            return False
+        self.remove_rows(x, removed)
+        return True
+
+    def remove_rows(self, x, rows):
+
+        #The purpose of this function is to clear rows (a boolean mask or an index array) from the domain of slot x, recording
+        #them on the trail while a search needs to undo them
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        if self.trail is not None:
+            self.trail.append((x, rows))
+        if self.stats is not None:
+            self.stats.pruned += len(rows)
+        self.slot_domains[x][rows] = False
+        self.dirty.add(x)
+
+    def undo(self, mark):
+
+        #The purpose of this function is to put back every row removed since the trail had `mark` entries
+        while len(self.trail) > mark:
+            x, rows = self.trail.pop()
+            self.slot_domains[x][rows] = True
+            self.dirty.add(x)
+
+    def discard_word(self, x, word):
+
+        #The purpose of this function is to remove `word` from the domain of slot x if it is there, it returns True if it was
+        words = self.words[self.crossword.lengths[x]]
+        row = bisect_left(words, word)
+        if row == len(words) or words[row] != word or not self.slot_domains[x][row]:
+            return False
+        self.remove_rows(x, np.array([row]))
+        return True
+
+    def only_word(self, x):
+
+        #Function that return the word of slot x when its domain has a single one
+        return self.words[self.crossword.lengths[x]][int(np.argmax(self.slot_domains[x]))]
+
+    def domain_size(self, x):
+
+        #Function that return the number of words left in the domain of slot x
+        return int(np.count_nonzero(self.slot_domains[x]))
+
+    def reduce_domain(self, x, value):
+
+        #The purpose of this function is to shrink the domain of an assigned slot to the row of its value
+        others = self.slot_domains[x].copy()
+        others[bisect_left(self.words[self.crossword.lengths[x]], value)] = False
+        self.remove_rows(x, others)
+
+    def restrict_domain(self, x, words):
+
+        #The purpose of this function is to remove from the domain of slot x every word that is not in `words`
+        keep = np.zeros_like(self.slot_domains[x])
+        all_words = self.words[self.crossword.lengths[x]]
+        for word in words:
+            row = bisect_left(all_words, word)
+            if row < len(all_words) and all_words[row] == word:
+                keep[row] = True
+        removed = self.slot_domains[x] & ~keep
+        if removed.any():
+            self.remove_rows(x, removed)
+
+    def order_slot_values(self, x):
+
+        #The purpose of this function is to return the words of slot x sorted by the number of values they rule out among the
+        #neighbors, a word rules out every word of a neighbor that has a different letter at the shared square, so for each
+        #neighbor that is its domain size minus the histogram entry of the letter the word puts there
+        length = self.crossword.lengths[x]
+        rows = np.flatnonzero(self.slot_domains[x])
+        ruled_out = np.zeros(len(rows), dtype=np.int64)
+        for y, (i, j) in self.crossword.slot_overlaps[x].items():
+            histogram = self.letter_histogram(y, j)
+            letters = self.matrix[length][rows, i]
+            ruled_out += histogram.sum() - histogram[letters]
+
+        words = self.words[length]
+        if self.salt is None:
+            order = np.argsort(ruled_out, kind="stable")
+        else:
+            order = np.lexsort((self.row_ties[length][rows], ruled_out))
+        return [words[rows[k]] for k in order]
+
+    def shuffle_ties(self):
+
+        #The purpose of this function is the same as in the set engine, the words with the same count are ordered by a random
+        #number drawn for each row of the length matrices
+        super().shuffle_ties()
+        generator = np.random.default_rng(self.salt)
+        self.row_ties = {length: generator.random(len(words)) for length, words in self.words.items()}
@@ -1,27 +1,67 @@
 import sys
+import threading
+from cache import SolutionCache
 from crossword import *
 from generate import *
+from stats import SearchStats
 
 
 from PySide6.QtWidgets import (
-    QMainWindow, QApplication,
+    QMainWindow, QApplication, QMessageBox,
     QLabel, QComboBox, QLineEdit, QLineEdit, QVBoxLayout, QHBoxLayout, QPushButton, QWidget, QFileDialog, QGridLayout, QProgressDialog
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, Signal
 from PySide6.QtGui import QPixmap
 
-class FinalWindow(QWidget):
+
+class SolveSignals(QObject):
+    
+    #Signals of a SolveTask, they are emitted from the worker thread and delivered in the thread of the window: progress
+    #carries the number of nodes explored so far, finished the (creator, outcome) pair of the solve, failed an error message
+    progress = Signal(int)
+    finished = Signal(object)
+    failed = Signal(str)
+
+
+class SolveTask(QRunnable):
+    
+    #Solves a crossword on a thread of a QThreadPool, so the event loop keeps running during the search, setting the cancel
+    #event stops the search, the outcome is then a TimedOut
+    
+    #How many nodes the search expands between two progress signals
+    PROGRESS_INTERVAL = 50
+
     def __init__(self, structure, words):
+        super(SolveTask, self).__init__()
+        self.structure = structure
+        self.words = words
+        self.cancel = threading.Event()
+        self.signals = SolveSignals()
+
+    def run(self):
+        try:
+            crossword = Crossword(self.structure, self.words)
+            creator = CrosswordCreator(crossword)
+            
+            creator.stats = SearchStats(
+                lambda stats: self.signals.progress.emit(stats.nodes), self.PROGRESS_INTERVAL
+            )
+            
+            #the FinalWindow of a grid already solved with these words is shown straight from the cache
+            assignment, _ = SolutionCache().solve(crossword, lambda: creator.solve(cancel=self.cancel))
+        except Exception as error:
+            self.signals.failed.emit(f"{type(error).__name__}: {error}")
+        else:
+            self.signals.finished.emit((creator, assignment))
+
+
+class FinalWindow(QWidget):
+    def __init__(self, creator, assignment):
         super(FinalWindow, self).__init__()
         self.setFixedWidth(600)
         self.setFixedHeight(400)
         
-        self.structure = structure
-        self.words = words
-        
-        crossword = Crossword(self.structure, self.words)
-        creator = CrosswordCreator(crossword)
-        assignment = creator.solve()
+        self.creator = creator
         
         layout = QVBoxLayout()
         
@@ -42,8 +82,8 @@ class FinalWindow(QWidget):
                              
         else:
             photo_label = QLabel(self)
-            creator.create_image(assignment, 'result.png')
-            pixmap = QPixmap('result.png')
+            pixmap = QPixmap()
+            pixmap.loadFromData(creator.render(assignment, "png"))
             photo_label.setPixmap(pixmap)
             photo_label.setScaledContents(True)
             self.resize(pixmap.width(), pixmap.height())
@@ -66,6 +106,8 @@ class AnotherWindow(QWidget):
         super(AnotherWindow, self).__init__()
         self.setFixedWidth(300)
         self.setFixedHeight(300)
+        self.progress = None
+        self.task = None
      
         
         
@@ -113,12 +155,62 @@ and the words, then press on Generate""")
         
         
     def generate(self):
-        self.window2 = FinalWindow(self.structure, self.words)
-        if self.window2.isVisible():
-            self.window2.hide()
-
-        else:
-            self.window2.show()  
+        
+        #the search runs on the thread pool, the window only shows up when its outcome arrives, meanwhile a progress
+        #dialog counts the nodes explored and its cancel button stops the search
+        task = SolveTask(self.structure, self.words)
+        self.task = task
+        self.signals = task.signals
+        self.signals.progress.connect(self.show_progress)
+        self.signals.finished.connect(self.show_result)
+        self.signals.failed.connect(self.show_error)
+        
+        self.progress = QProgressDialog("Solving...", "Cancel", 0, 0, self)
+        self.progress.setWindowModality(Qt.WindowModal)
+        self.progress.setMinimumDuration(0)
+        self.progress.canceled.connect(task.cancel.set)
+        self.progress.show()
+        
+        QThreadPool.globalInstance().start(task)
+    
+    def cancel_solve(self):
+        
+        #stops the search still running, if any, it then finishes with a TimedOut outcome
+        if self.task is not None:
+            self.task.cancel.set()
+    
+    def closeEvent(self, event):
+        
+        #closing the window stops its search instead of leaving it running with nothing to show the outcome
+        self.cancel_solve()
+        self.close_progress()
+        super(AnotherWindow, self).closeEvent(event)
+    
+    def show_progress(self, nodes):
+        if self.progress is not None:
+            self.progress.setLabelText(f"Solving... {nodes} nodes explored")
+    
+    def close_progress(self):
+        if self.progress is not None:
+            self.progress.canceled.disconnect()
+            self.progress.close()
+            self.progress = None
+    
+    def show_result(self, outcome):
+        self.task = None
+        self.close_progress()
+        creator, assignment = outcome
+        
+        #a cancelled search has nothing to show
+        if isinstance(assignment, TimedOut):
+            return
+        self.window2 = FinalWindow(creator, assignment)
+        self.window2.show()
+    
+    def show_error(self, message):
+        self.task = None
+        self.close_progress()
+        QMessageBox.critical(self, "Error", message)
         
         
     
@@ -179,7 +271,17 @@ coded using python, and pyside6""")
   
         
 
-app = QApplication(sys.argv)
-w = MainWindow()
-w.show()
-app.exec()
\ No newline at end of file
+def main():
+    app = QApplication(sys.argv)
+    w = MainWindow()
+    
+    #on quit, the search still running is cancelled and waited for, so it does not emit its signals once the objects
+    #behind them are deleted
+    app.aboutToQuit.connect(w.window1.cancel_solve)
+    app.aboutToQuit.connect(lambda: QThreadPool.globalInstance().waitForDone())
+    w.show()
+    app.exec()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""Render crosswords as PNG or SVG, in memory.
+
+The font, the measures of its glyphs and the pre-rendered tile of each
+letter are cached for the whole process, so rendering many puzzles only
+draws each letter once per cell size. Images are returned as bytes or as
+PIL images; writing them to disk is up to the caller.
+"""
+
+import io
+import os
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from crossword import Variable
+
+FONT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "assets", "fonts", "OpenSans-Regular.ttf"
+)
+CELL_SIZE = 100
+CELL_BORDER = 2
+
+FORMATS = ("png", "svg", "image")
+
+
+def letter_grid(crossword, assignment):
+    """Return the letters of an assignment as a 2D list, None for the
+    squares without a letter."""
+    letters = [[None] * crossword.width for _ in range(crossword.height)]
+    for variable, word in assignment.items():
+        for k, letter in enumerate(word):
+            i = variable.i + (k if variable.direction == Variable.DOWN else 0)
+            j = variable.j + (k if variable.direction == Variable.ACROSS else 0)
+            letters[i][j] = letter
+    return letters
+
+
+@lru_cache(maxsize=None)
+def load_font(size, path=FONT_PATH):
+    """Return the font of a given size, loading it only once."""
+    from PIL import ImageFont
+    return ImageFont.truetype(path, size)
+
+
+@lru_cache(maxsize=None)
+def glyph_box(letter, size, path=FONT_PATH):
+    """Return the (left, top, right, bottom) box of a letter drawn at the
+    origin with the font of a given size."""
+    return load_font(size, path).getbbox(letter)
+
+
+@lru_cache(maxsize=4096)
+def letter_tile(letter, cell_size=CELL_SIZE, cell_border=CELL_BORDER):
+    """Return the white inside of a cell with `letter` centered in it, or
+    an empty one if `letter` is None.
+
+    Tiles are cached and shared, paste them rather than drawing on them.
+    """
+    from PIL import Image, ImageDraw
+    interior = cell_size - 2 * cell_border + 1
+    tile = Image.new("RGB", (interior, interior), "white")
+    if letter:
+        size = cell_size * 4 // 5
+        left, top, right, bottom = glyph_box(letter, size)
+        ImageDraw.Draw(tile).text(
+            ((interior - (right - left)) / 2 - left, (interior - (bottom - top)) / 2 - top),
+            letter, fill="black", font=load_font(size)
+        )
+    return tile
+
+
+def render_image(crossword, assignment, cell_size=CELL_SIZE, cell_border=CELL_BORDER):
+    """Return a PIL image of the crossword filled with an assignment."""
+    from PIL import Image
+    letters = letter_grid(crossword, assignment)
+    image = Image.new(
+        "RGB", (crossword.width * cell_size, crossword.height * cell_size), "black"
+    )
+    for i in range(crossword.height):
+        for j in range(crossword.width):
+            if crossword.structure[i][j]:
+                image.paste(
+                    letter_tile(letters[i][j], cell_size, cell_border),
+                    (j * cell_size + cell_border, i * cell_size + cell_border)
+                )
+    return image
+
+
+def render_png(crossword, assignment, cell_size=CELL_SIZE, cell_border=CELL_BORDER, compress_level=6):
+    """Return the PNG bytes of the crossword filled with an assignment."""
+    output = io.BytesIO()
+    render_image(crossword, assignment, cell_size, cell_border).save(
+        output, "PNG", compress_level=compress_level
+    )
+    return output.getvalue()
+
+
+def render_svg(crossword, assignment, cell_size=CELL_SIZE, cell_border=CELL_BORDER):
+    """Return an SVG document of the crossword filled with an assignment."""
+    letters = letter_grid(crossword, assignment)
+    width = crossword.width * cell_size
+    height = crossword.height * cell_size
+    interior = cell_size - 2 * cell_border
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">',
+        f'<rect width="{width}" height="{height}" fill="black"/>',
+        f'<g font-family="Open Sans, sans-serif" font-size="{cell_size * 4 // 5}" '
+        f'text-anchor="middle" dominant-baseline="central">',
+    ]
+    for i in range(crossword.height):
+        for j in range(crossword.width):
+            if not crossword.structure[i][j]:
+                continue
+            x = j * cell_size + cell_border
+            y = i * cell_size + cell_border
+            parts.append(
+                f'<rect x="{x}" y="{y}" width="{interior}" height="{interior}" fill="white"/>'
+            )
+            if letters[i][j]:
+                parts.append(
+                    f'<text x="{x + interior / 2:g}" y="{y + interior / 2:g}">'
+                    f'{escape(letters[i][j])}</text>'
+                )
+    parts.append("</g>")
+    parts.append("</svg>")
+    return "\n".join(parts) + "\n"
+
+
+def render(crossword, assignment, format="png", **options):
+    """Render a crossword as PNG bytes, an SVG string or a PIL image
+    ("png", "svg" or "image")."""
+    if format == "png":
+        return render_png(crossword, assignment, **options)
+    if format == "svg":
+        return render_svg(crossword, assignment, **options)
+    if format == "image":
+        return render_image(crossword, assignment, **options)
+    raise ValueError(f"unknown format {format!r}")
@@ -0,0 +1,312 @@
+"""Serve crossword solves over HTTP, on localhost or a Unix socket.
+
+The server is a single asyncio loop that hands every solve to a pool of
+worker processes. Each worker keeps the vocabularies it has loaded (and
+the buckets and letter counts they cache) for its whole life, so only
+the first request for a words file pays for opening it; --preload opens
+some words files in every worker at startup.
+
+    POST /solve   {"structure": "data/structure1.txt", "words": "data/words1.txt"}
+    GET /health
+
+A solve request takes the keys of a batch.py job ("engine", "inference",
+"heuristic", "restarts", "seed", "timeout", "max_nodes") and gets the same
+result dict back. Its structure and words files must be inside --root
+(the data directory by default), or be one of the --preload words files;
+other paths get a 403, so the server does not read files it was not
+meant to serve.
+At most --workers solves run at a time and at most --queue more wait for
+a worker; beyond that the server answers 503 right away instead of
+queueing without bound. Every request has a deadline, --timeout seconds
+or its own "timeout" if shorter, counted from its arrival: the time spent
+waiting is taken from its search budget, and a request still unanswered
+at its deadline gets a 504. A client has --read-timeout seconds to send
+its whole request, a connection that is idle or too slow gets a 408.
+
+Usage: python server.py [--port 8765 | --unix PATH] [--root DIRECTORY] [--workers N] [--queue N] [--timeout SECONDS]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import load_vocabulary, solve_job
+
+# Seconds a worker is given past the deadline of its search to answer
+GRACE = 1.0
+
+# Largest request body accepted, in bytes
+MAX_BODY = 1 << 20
+
+# Seconds a client is given to send its request
+READ_TIMEOUT = 10.0
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+    408: "Request Timeout", 413: "Payload Too Large", 503: "Service Unavailable", 504: "Gateway Timeout",
+}
+
+
+def preload(words_files):
+    """Open words files in a worker process, so they are warm."""
+    for words_file in words_files:
+        load_vocabulary(words_file)
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        """An error answered with an HTTP status and a message."""
+        super().__init__(message)
+        self.status = status
+
+
+async def read_request(reader):
+    """Read an HTTP request, return its (method, path, body)."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    length = 0
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            try:
+                length = int(value)
+            except ValueError:
+                raise HTTPError(400, "bad Content-Length")
+    if length < 0:
+        raise HTTPError(400, "bad Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?", 1)[0], body
+
+
+async def write_response(writer, status, payload):
+    """Write a JSON response and close the connection."""
+    body = (json.dumps(payload) + "\n").encode()
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n"
+    )
+    writer.write(head.encode() + body)
+    await writer.drain()
+
+
+class SolveServer():
+
+    def __init__(self, workers=None, queue=None, timeout=30.0, defaults=None, preload_words=(), root="data",
+                 read_timeout=READ_TIMEOUT):
+        """Create a server solving in `workers` processes, with room for
+        `queue` waiting requests (as many as workers by default), for the
+        files inside `root` and the preloaded words files."""
+        self.workers = workers or os.cpu_count() or 1
+        self.queue = self.workers if queue is None else queue
+        self.timeout = timeout
+        self.read_timeout = read_timeout
+        self.defaults = dict(defaults or {})
+        self.root = os.path.realpath(root)
+        self.preloaded = {os.path.realpath(words_file) for words_file in preload_words}
+        self.executor = ProcessPoolExecutor(
+            self.workers, initializer=preload, initargs=(tuple(preload_words),)
+        )
+        self.slots = asyncio.Semaphore(self.workers + self.queue)
+        self.requests = 0
+        self.pending = 0
+        self.served = 0
+
+    async def handle(self, reader, writer):
+        """Answer one connection."""
+        try:
+            try:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), self.read_timeout)
+                except asyncio.TimeoutError:
+                    raise HTTPError(408, f"no request within {self.read_timeout:g}s")
+                if request is None:
+                    return
+                status, payload = await self.dispatch(*request)
+            except HTTPError as error:
+                status, payload = error.status, {"error": str(error)}
+            except asyncio.IncompleteReadError:
+                return
+            await write_response(writer, status, payload)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body):
+        """Return the (status, payload) answering a request."""
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            return 200, {
+                "workers": self.workers, "queue": self.queue,
+                "pending": self.pending, "served": self.served,
+            }
+        if path != "/solve":
+            raise HTTPError(404, f"no such endpoint {path}")
+        if method != "POST":
+            raise HTTPError(405, "use POST")
+        try:
+            job = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, "body is not JSON")
+        if not isinstance(job, dict) or not all(isinstance(job.get(key), str) for key in ("structure", "words")):
+            raise HTTPError(400, "a solve needs \"structure\" and \"words\"")
+        self.check_path(job["structure"])
+        self.check_path(job["words"], self.preloaded)
+        return await self.solve(job)
+
+    def check_path(self, path, allowed=()):
+        """Refuse a file outside the data root, unless it is one of the
+        `allowed` real paths."""
+        try:
+            real = os.path.realpath(path)
+            inside = real in allowed or os.path.commonpath([self.root, real]) == self.root
+        except ValueError:
+            inside = False
+        if not inside:
+            raise HTTPError(403, f"{path} is outside the data root")
+
+    async def solve(self, job):
+        """Solve a job in the pool, within its deadline."""
+        start = time.monotonic()
+        timeout = self.timeout
+        if job.get("timeout") is not None:
+            try:
+                timeout = min(timeout, float(job["timeout"]))
+            except (TypeError, ValueError):
+                raise HTTPError(400, "\"timeout\" must be a number of seconds")
+        deadline = start + timeout
+
+        # A full pool and queue is answered right away, so the clients
+        # back off instead of piling up
+        if self.slots.locked():
+            raise HTTPError(503, "too many pending solves, retry later")
+        await self.slots.acquire()
+        self.requests += 1
+        self.pending += 1
+        job.setdefault("id", self.requests)
+
+        # The search budget starts when a worker picks the job up, the
+        # time it waited for one is taken from it there
+        job["deadline_wall"] = time.time() + timeout
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, solve_queued, job, self.defaults
+        )
+
+        # The slot is only given back once the worker is done, even if the
+        # client was answered before
+        def release(_):
+            self.pending -= 1
+            self.served += 1
+            self.slots.release()
+        future.add_done_callback(release)
+
+        try:
+            result = await asyncio.wait_for(
+                asyncio.shield(future), deadline - time.monotonic() + GRACE
+            )
+        except asyncio.TimeoutError:
+            raise HTTPError(504, f"no answer within {timeout:g}s")
+        result["latency"] = round(time.monotonic() - start, 6)
+        return 200, result
+
+    async def serve(self, host="127.0.0.1", port=8765, unix=None):
+        """Accept connections until cancelled."""
+        if unix is not None:
+            server = await asyncio.start_unix_server(self.handle, unix)
+            where = unix
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            where = "http://{}:{}".format(*server.sockets[0].getsockname()[:2])
+        print(f"serving on {where} with {self.workers} workers", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """Stop the worker processes."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def solve_queued(job, defaults):
+    """Solve a job in a worker with what is left of its deadline."""
+    job = dict(job)
+    remaining = job.pop("deadline_wall") - time.time()
+    if remaining <= 0:
+        return {"id": job["id"], "structure": job["structure"], "words": job["words"],
+                "status": "timeout", "reason": "deadline", "partial": [], "seconds": 0.0}
+    job["timeout"] = remaining
+    return solve_job(job, defaults)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve crossword solves over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on (default: 8765)")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead")
+    parser.add_argument(
+        "--root", default="data", metavar="DIRECTORY",
+        help="directory the structure and words files of the requests must be in (default: data)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="number of solver processes (default: number of CPUs)"
+    )
+    parser.add_argument("--queue", type=int, help="solves waiting for a worker before 503s (default: --workers)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="deadline of each request in seconds (default: 30)")
+    parser.add_argument(
+        "--read-timeout", type=float, default=READ_TIMEOUT,
+        help=f"seconds a client has to send its request (default: {READ_TIMEOUT:g})"
+    )
+    parser.add_argument("--max-nodes", type=int, help="nodes each search may expand")
+    parser.add_argument("--engine", choices=("sets", "numpy"), default="sets")
+    parser.add_argument("--inference", choices=("none", "forward", "mac"), default="mac")
+    parser.add_argument("--heuristic", default="degree")
+    parser.add_argument("--no-cache", action="store_true", help="solve every request instead of reusing cached results")
+    parser.add_argument(
+        "--preload", nargs="*", default=(), metavar="WORDS",
+        help="words files every worker opens at startup"
+    )
+    args = parser.parse_args()
+
+    defaults = {
+        "engine": args.engine,
+        "inference": None if args.inference == "none" else args.inference,
+        "heuristic": args.heuristic,
+        "max_nodes": args.max_nodes,
+        "cache": not args.no_cache,
+    }
+
+    async def run():
+        server = SolveServer(
+            args.workers, args.queue, args.timeout, defaults, args.preload, args.root, args.read_timeout
+        )
+        try:
+            await server.serve(args.host, args.port, args.unix)
+        finally:
+            server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
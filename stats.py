@@ -0,0 +1,86 @@
+import time
+
+# Phases timed inside the search, they are part of its "search" phase
+SEARCH_PHASES = ("ordering", "propagation")
+
+
+class SearchStats():
+    """Counters and timings collected by a CrosswordCreator.
+
+    A creator only collects them when its `stats` attribute is set to an
+    instance of this class, so searches without it pay nothing.
+    """
+
+    def __init__(self, callback=None, interval=1000):
+        """Create empty statistics.
+
+        If `callback` is given, it is called with these statistics every
+        `interval` search nodes, to report the progress of long searches.
+        """
+        self.callback = callback
+        self.interval = interval
+        self.nodes = 0
+        self.backtracks = 0
+        self.backjumps = 0
+        self.restarts = 0
+        self.revisions = 0
+        self.pruned = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.phases = {}
+        self.start = time.perf_counter()
+
+    def elapsed(self):
+        """Return the seconds since the statistics were created."""
+        return time.perf_counter() - self.start
+
+    def visit(self, nodes, depth):
+        """Record that the search expanded its `nodes`th node, with `depth`
+        slots assigned."""
+        self.nodes = nodes
+        self.depth = depth
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if self.callback is not None and not nodes % self.interval:
+            self.callback(self)
+
+    def timed(self, phase, function, *args):
+        """Call function(*args), adding its wall time to `phase`."""
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.phases[phase] = self.phases.get(phase, 0) + time.perf_counter() - start
+
+    def as_dict(self):
+        """Return the statistics as a JSON friendly dict."""
+        return {
+            "nodes": self.nodes,
+            "backtracks": self.backtracks,
+            "backjumps": self.backjumps,
+            "restarts": self.restarts,
+            "revisions": self.revisions,
+            "pruned": self.pruned,
+            "max_depth": self.max_depth,
+            "seconds": self.elapsed(),
+            "phases": dict(self.phases),
+        }
+
+    def __str__(self):
+        lines = [
+            f"nodes:      {self.nodes}",
+            f"backtracks: {self.backtracks}",
+            f"backjumps:  {self.backjumps}",
+            f"restarts:   {self.restarts}",
+            f"revisions:  {self.revisions}",
+            f"pruned:     {self.pruned}",
+            f"max depth:  {self.max_depth}",
+        ]
+        phases = [phase for phase in self.phases if phase not in SEARCH_PHASES]
+        for phase in phases:
+            lines.append(f"{phase + ':':<24}{self.phases[phase] * 1000:.1f}ms")
+            if phase == "search":
+                for part in SEARCH_PHASES:
+                    if part in self.phases:
+                        lines.append(f"{'  ' + part + ':':<24}{self.phases[part] * 1000:.1f}ms")
+        return "\n".join(lines)
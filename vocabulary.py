@@ -0,0 +1,388 @@
+"""Vocabularies bucketed by word length, with a compiled binary cache.
+
+A words file can be compiled into an artifact holding, for every word
+length, the sorted words as fixed-width single-byte rows and an index of
+the words having each letter at each position. Vocabulary.open() memory
+maps that artifact when it is up to date with the words file, and
+compiles it otherwise, so repeated solves skip parsing the text.
+
+Usage: python vocabulary.py words_file [words_file ...]
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections import Counter
+
+MAGIC = b"CWVOCAB\0"
+VERSION = 1
+ENCODING = "latin-1"
+
+# magic, version, byte order, source size, source mtime, number of buckets
+HEADER = struct.Struct("<8sIcQqI")
+
+# word length, number of words, offset of the words, offset of the index
+BUCKET = struct.Struct("<IIQQ")
+
+# The index of a bucket of length L holding n words is, for each position,
+# LETTERS + 1 offsets into that position's n postings (word numbers
+# grouped by the letter at that position)
+LETTERS = 256
+
+
+def cache_directory():
+    """Return the directory where compiled files are cached."""
+    directory = os.environ.get("CROSSWORD_CACHE")
+    if not directory:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        directory = os.path.join(base, "crossword")
+    return directory
+
+
+def artifact_path(words_file):
+    """Return the path of the compiled artifact of a words file."""
+    key = hashlib.sha1(os.path.abspath(words_file).encode()).hexdigest()
+    return os.path.join(cache_directory(), "vocabulary", f"{key}.vocab")
+
+
+def build_index(blob, length):
+    """Return the offsets and postings arrays of a bucket."""
+    count = len(blob) // length if length else 0
+    offsets = array("I")
+    postings = array("I")
+    for position in range(length):
+        groups = [[] for _ in range(LETTERS)]
+        column = blob[position::length]
+        for k, letter in enumerate(column):
+            groups[letter].append(k)
+        start = position * count
+        offsets.append(start)
+        for group in groups:
+            postings.extend(group)
+            offsets.append(start + len(group))
+            start += len(group)
+    return offsets, postings
+
+
+class Vocabulary():
+
+    def __init__(self, words=None, blobs=None, indexes=None, path=None):
+        """Create a vocabulary from words bucketed by length.
+
+        `words` maps lengths to sorted lists of words, `blobs` maps
+        lengths to the same words encoded as fixed-width rows; either one
+        may be given, the other is derived when needed. `indexes` maps
+        lengths to (offsets, postings) arrays, built on demand otherwise.
+        `path` is the words file the vocabulary comes from, if any.
+        """
+        self._words = dict(words or {})
+        self._blobs = dict(blobs or {})
+        self._indexes = dict(indexes or {})
+        self._buckets = {}
+        self._letter_counts = {}
+        self._word_set = None
+        self._fingerprint = None
+        self._mmap = None
+        self.path = path
+
+    @classmethod
+    def from_words(cls, words, path=None):
+        """Create a vocabulary from an iterable of words."""
+        buckets = {}
+        for word in sorted(set(words)):
+            if word:
+                buckets.setdefault(len(word), []).append(word)
+        return cls(words=buckets, path=path)
+
+    @classmethod
+    def parse(cls, words_file):
+        """Read a text words file, one word per line."""
+        with open(words_file) as f:
+            return cls.from_words(f.read().upper().splitlines(), path=words_file)
+
+    @classmethod
+    def load(cls, artifact, words_file=None):
+        """Memory map a compiled artifact.
+
+        If `words_file` is given, return None when the artifact is missing,
+        was compiled by another version or does not match the file.
+        """
+        try:
+            f = open(artifact, "rb")
+        except OSError:
+            if words_file is None:
+                raise
+            return None
+        with f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return None
+        try:
+            header = HEADER.unpack_from(data, 0)
+        except struct.error:
+            if words_file is None:
+                raise ValueError(f"{artifact} is not a compatible vocabulary")
+            return None
+        magic, version, byteorder, size, mtime, buckets = header
+        if (magic, version, byteorder) != (MAGIC, VERSION, sys.byteorder[0].encode()):
+            if words_file is None:
+                raise ValueError(f"{artifact} is not a compatible vocabulary")
+            return None
+        if words_file is not None:
+            stat = os.stat(words_file)
+            if (size, mtime) != (stat.st_size, stat.st_mtime_ns):
+                return None
+
+        view = memoryview(data)
+        blobs = {}
+        indexes = {}
+        for k in range(buckets):
+            length, count, words_offset, index_offset = BUCKET.unpack_from(
+                data, HEADER.size + k * BUCKET.size
+            )
+            blobs[length] = view[words_offset:words_offset + count * length]
+            offsets_size = length * (LETTERS + 1) * 4
+            indexes[length] = (
+                view[index_offset:index_offset + offsets_size].cast("I"),
+                view[index_offset + offsets_size:
+                     index_offset + offsets_size + length * count * 4].cast("I"),
+            )
+        vocabulary = cls(blobs=blobs, indexes=indexes, path=words_file)
+        vocabulary._mmap = data
+        return vocabulary
+
+    @classmethod
+    def open(cls, words_file, cache=True):
+        """Return the vocabulary of a words file.
+
+        With `cache`, the compiled artifact is used when it is up to date,
+        and written after parsing the text otherwise.
+        """
+        if not cache:
+            return cls.parse(words_file)
+        artifact = artifact_path(words_file)
+        vocabulary = cls.load(artifact, words_file)
+        if vocabulary is not None:
+            return vocabulary
+        vocabulary = cls.parse(words_file)
+        try:
+            vocabulary.compile(artifact)
+        except (OSError, ValueError):
+            # Not writable or not single-byte encodable, use the text
+            pass
+        return vocabulary
+
+    def __reduce__(self):
+        # Memory maps cannot be pickled, reopen the words file instead
+        if self.path is not None:
+            return (Vocabulary.open, (self.path,))
+        return (Vocabulary.from_words, (sorted(self.word_set()),))
+
+    def __len__(self):
+        return sum(self.count(length) for length in self.lengths())
+
+    def lengths(self):
+        """Return the sorted word lengths of the vocabulary."""
+        return sorted(set(self._words) | set(self._blobs))
+
+    def count(self, length):
+        """Return the number of words of a given length."""
+        if length in self._words:
+            return len(self._words[length])
+        if length in self._blobs:
+            return len(self._blobs[length]) // length
+        return 0
+
+    def words(self, length):
+        """Return the sorted list of words of a given length."""
+        if length not in self._words:
+            if length not in self._blobs:
+                return []
+            text = bytes(self._blobs[length]).decode(ENCODING)
+            self._words[length] = [
+                text[k:k + length] for k in range(0, len(text), length)
+            ]
+        return self._words[length]
+
+    def bucket(self, length):
+        """Return the frozenset of words of a given length.
+
+        The same set is returned on every call, so it can be shared.
+        """
+        if length not in self._buckets:
+            self._buckets[length] = frozenset(self.words(length))
+        return self._buckets[length]
+
+    def word_bytes(self, length):
+        """Return the words of a given length as fixed-width byte rows.
+
+        Raises ValueError if a word is not single-byte encodable.
+        """
+        if length not in self._blobs:
+            try:
+                self._blobs[length] = "".join(self.words(length)).encode(ENCODING)
+            except UnicodeEncodeError as error:
+                raise ValueError(
+                    "vocabulary has letters outside of latin-1"
+                ) from error
+        return self._blobs[length]
+
+    def word_set(self):
+        """Return the set of every word of the vocabulary."""
+        if self._word_set is None:
+            self._word_set = set()
+            for length in self.lengths():
+                self._word_set.update(self.words(length))
+        return self._word_set
+
+    def fingerprint(self):
+        """Return a hex digest of the words of the vocabulary.
+
+        Two vocabularies with the same words have the same fingerprint,
+        wherever they come from.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for length in self.lengths():
+                try:
+                    words = self.word_bytes(length)
+                except ValueError:
+                    words = "\n".join(self.words(length)).encode()
+                digest.update(struct.pack("<IQ", length, len(words)))
+                digest.update(words)
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def index(self, length):
+        """Return the (offsets, postings) index of a given length."""
+        if length not in self._indexes:
+            self._indexes[length] = build_index(self.word_bytes(length), length)
+        return self._indexes[length]
+
+    def postings(self, length, position, letter):
+        """Return the numbers of the words of a given length that have
+        `letter` at `position`, in increasing order."""
+        offsets, postings = self.index(length)
+        code = letter.encode(ENCODING)[0]
+        base = position * (LETTERS + 1)
+        return postings[offsets[base + code]:offsets[base + code + 1]]
+
+    def matching(self, length, letters):
+        """Return the frozenset of words of a given length that have the
+        letters of `letters`, (position, letter) pairs, at those positions.
+
+        The postings of the letters are intersected, shortest first, so
+        the cost follows the number of words that match rather than the
+        size of the bucket.
+        """
+        if not letters:
+            return self.bucket(length)
+        words = self.words(length)
+        try:
+            lists = sorted(
+                (self.postings(length, position, letter) for position, letter in letters), key=len
+            )
+        except ValueError:
+            # Letters outside of latin-1 have no postings
+            return frozenset(
+                word for word in words
+                if all(word[position] == letter for position, letter in letters)
+            )
+        rows = set(lists[0])
+        for postings in lists[1:]:
+            if not rows:
+                break
+            rows.intersection_update(postings)
+        return frozenset(words[k] for k in rows)
+
+    def letter_counts(self, length):
+        """Return, for each position, a Counter of the letters of the words
+        of a given length at that position.
+
+        The same Counters are returned on every call, copy them before
+        changing them.
+        """
+        if length in self._letter_counts:
+            return self._letter_counts[length]
+
+        # Read the sizes of the postings when the index is there, else
+        # count the letters of the words
+        counts = [Counter() for _ in range(length)]
+        if length in self._indexes:
+            offsets, _ = self._indexes[length]
+            for position, counter in enumerate(counts):
+                base = position * (LETTERS + 1)
+                for code in range(LETTERS):
+                    count = offsets[base + code + 1] - offsets[base + code]
+                    if count:
+                        counter[bytes((code,)).decode(ENCODING)] = count
+        else:
+            for word in self.words(length):
+                for position, letter in enumerate(word):
+                    counts[position][letter] += 1
+        self._letter_counts[length] = counts
+        return counts
+
+    def compile(self, artifact):
+        """Write the vocabulary to a compiled artifact.
+
+        The artifact records the size and modification time of the words
+        file, so it is invalidated when that file changes.
+        """
+        stat = os.stat(self.path) if self.path else None
+        lengths = self.lengths()
+        blobs = [bytes(self.word_bytes(length)) for length in lengths]
+        indexes = [self.index(length) for length in lengths]
+
+        # Lay out the buckets after the header, keeping the arrays aligned
+        offset = HEADER.size + len(lengths) * BUCKET.size
+        table = []
+        for length, blob, (offsets, postings) in zip(lengths, blobs, indexes):
+            words_offset = offset
+            index_offset = words_offset + len(blob)
+            index_offset += (-index_offset) % 4
+            offset = index_offset + (len(offsets) + len(postings)) * 4
+            table.append((length, len(blob) // length, words_offset, index_offset))
+
+        directory = os.path.dirname(artifact) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(
+                    MAGIC, VERSION, sys.byteorder[0].encode(),
+                    stat.st_size if stat else 0,
+                    stat.st_mtime_ns if stat else 0,
+                    len(lengths)
+                ))
+                for entry in table:
+                    f.write(BUCKET.pack(*entry))
+                for blob, (offsets, postings) in zip(blobs, indexes):
+                    f.write(blob)
+                    f.write(bytes((-f.tell()) % 4))
+                    f.write(bytes(offsets))
+                    f.write(bytes(postings))
+            os.replace(temporary, artifact)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python vocabulary.py words_file [words_file ...]")
+    for words_file in sys.argv[1:]:
+        artifact = artifact_path(words_file)
+        Vocabulary.parse(words_file).compile(artifact)
+        print(f"{words_file} -> {artifact}")
+
+
+if __name__ == "__main__":
+    main()